@@ -1,56 +1,59 @@
 from flask import Flask
-from backend.database import db
-from backend.models import Account, PermissionGroup
-from backend.resources import api
-from backend.config import LocalDevelopmentConfig
-from flask_security import Security, SQLAlchemyUserDatastore
-from werkzeug.security import generate_password_hash
-from backend.celery_init import celery_init_app
 from flask_caching import Cache
+from backend.config import LocalDevelopmentConfig
+from backend.database import db
+from backend.events import event_broker
+from backend.commands import register_commands
 
 
-cache = Cache(config={
-    'CACHE_TYPE': 'RedisCache',
-    'CACHE_REDIS_HOST': 'localhost',
-    'CACHE_REDIS_PORT': 6379,
-    'CACHE_REDIS_DB': 0,
-    'CACHE_DEFAULT_TIMEOUT': 300
-})
+cache = Cache()
 
-def create_app():
+# Building an app only wires extensions together: nothing here touches the
+# database. Run `flask --app app init` once (and after upgrades) to create
+# the schema and seed the roles and admin account.
+
+def _create_base_app(config):
     app = Flask(__name__)
-    app.config.from_object(LocalDevelopmentConfig)
+    app.config.from_object(config)
 
     db.init_app(app)
-    api.init_app(app)
+    cache.init_app(app)
+    app.cache = cache
+    event_broker.init_app(app)
+    register_commands(app)
+    return app
 
-    cache.init_app(app) 
-    app.cache = cache   
+
+def create_app(config=LocalDevelopmentConfig):
+    """The web application. Celery is only loaded once a request queues a task."""
+    from flask_security import Security, SQLAlchemyUserDatastore
+    from backend.models import Account, PermissionGroup
+    from backend.resources import api
+    from backend.routes import routes
+    from backend.auth_cache import init_identity_cache
+    from backend.passwords import password_hasher
+    from backend.instrumentation import init_instrumentation
+
+    app = _create_base_app(config)
+    api.init_app(app)
+    init_instrumentation(app, cache)
 
     datastore = SQLAlchemyUserDatastore(db, Account, PermissionGroup)
     app.security = Security(app, datastore)
-    app.app_context().push()
+    init_identity_cache(app)
+    password_hasher.init_app(app)
+    app.register_blueprint(routes)
     return app
 
-app = create_app()
-celery = celery_init_app(app)
-
-
-with app.app_context():
-    db.create_all()
-
-    app.security.datastore.find_or_create_role(name="admin", description="System Administrator")
-    app.security.datastore.find_or_create_role(name = "user", description = "General user of app")
-    db.session.commit()
 
-    if not app.security.datastore.find_user(mail="aastha@gmail.com"):
-        app.security.datastore.create_user(mail="astha@gmail.com",
-                                           display_name="Aastha",
-                                           password_hash=generate_password_hash("aastha123"),
-                                           roles=["admin"])
-    db.session.commit()
+def create_worker(config=LocalDevelopmentConfig):
+    """The Celery app for workers and beat, on a Flask app without the web stack."""
+    from backend.celery_init import celery_init_app
+    from backend.instrumentation import instrument_cache
+    app = _create_base_app(config)
+    instrument_cache(cache)
+    return celery_init_app(app)
 
-from backend.routes import *
 
-if __name__=="__main__":
-    app.run()
+if __name__ == "__main__":
+    create_app().run()
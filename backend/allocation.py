@@ -0,0 +1,102 @@
+from datetime import datetime
+from .database import db
+from .models import Facility, Slot, Booking
+from .slot_index import slot_index
+from .dashboard import record_reservation, record_release
+from .pricing import schedule_for
+
+
+def reserve_free_slot(facility_id, account_id, reg_number, attempts=3):
+    """
+    Claim a free slot of a facility and open a booking for it in one
+    transaction. The claim is a conditional UPDATE ... WHERE
+    slot_state = 'A' RETURNING, so two concurrent reservations can never
+    take the same slot. The free-slot index supplies the candidate; if it
+    is stale the candidate is discarded from the index and the first free
+    slot is picked in the UPDATE itself. Returns the new Booking, or None
+    if the facility is full.
+    """
+    try:
+        candidate = slot_index.free_slot(facility_id)
+        claimed = _claim_slot(facility_id, candidate, account_id, reg_number) if candidate else None
+        if candidate and not claimed:
+            slot_index.discard(facility_id, candidate)
+        for _ in range(attempts):
+            if claimed or not _has_free_slot(facility_id):
+                break
+            first_free = db.select(Slot.slot_id)\
+                .where(Slot.facility_id == facility_id, Slot.slot_state == "A")\
+                .order_by(Slot.slot_id).limit(1).scalar_subquery()
+            claimed = _claim_slot(facility_id, first_free, account_id, reg_number)
+        if not claimed:
+            db.session.rollback()
+            return None
+
+        booking = Booking(
+            account_id=account_id,
+            slot_id=claimed.slot_id,
+            reg_number_snapshot=reg_number,
+            facility_snapshot=db.session.get(Facility, facility_id).place_label,
+            slot_snapshot=claimed.slot_label,
+            start_time=datetime.utcnow()
+        )
+        db.session.add(booking)
+        record_reservation(facility_id)
+        db.session.commit()
+        return booking
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+def _claim_slot(facility_id, slot_id, account_id, reg_number):
+    return db.session.execute(
+        db.update(Slot)
+        .where(Slot.slot_id == slot_id, Slot.facility_id == facility_id, Slot.slot_state == "A")
+        .values(slot_state="O", assigned_user=account_id, reg_number=reg_number)
+        .returning(Slot.slot_id, Slot.slot_label),
+        execution_options={"synchronize_session": False}
+    ).first()
+
+
+def _has_free_slot(facility_id):
+    return db.session.execute(
+        db.select(Slot.slot_id).where(Slot.facility_id == facility_id, Slot.slot_state == "A").limit(1)
+    ).first() is not None
+
+
+def release_booked_slot(slot, account_id):
+    """
+    Close the account's open booking on a slot, charge it under the
+    facility's tariff and free the slot in one transaction. The booking is closed with a conditional
+    UPDATE ... WHERE end_time IS NULL so a double release charges once.
+    Returns the closed Booking, or None if there was no open booking.
+    """
+    try:
+        booking = Booking.query.filter_by(slot_id=slot.slot_id, account_id=account_id, end_time=None)\
+            .order_by(Booking.booking_id.desc()).first()
+        if not booking:
+            return None
+        end_time = datetime.utcnow()
+        cost = schedule_for(slot.facility_id).charge(booking.start_time, end_time)
+        closed = db.session.execute(
+            db.update(Booking)
+            .where(Booking.booking_id == booking.booking_id, Booking.end_time.is_(None))
+            .values(end_time=end_time, cost_charged=cost),
+            execution_options={"synchronize_session": False}
+        ).rowcount
+        if not closed:
+            db.session.rollback()
+            return None
+        db.session.execute(
+            db.update(Slot)
+            .where(Slot.slot_id == slot.slot_id)
+            .values(slot_state="A", assigned_user=None, reg_number=None),
+            execution_options={"synchronize_session": False}
+        )
+        record_release(slot.facility_id, cost)
+        db.session.commit()
+        return booking
+    except Exception:
+        db.session.rollback()
+        raise
@@ -0,0 +1,150 @@
+from datetime import datetime, timedelta
+from flask import current_app
+from .database import db
+from .models import Slot, Booking, BookingArchive, ArchivedFacilityTotals, ArchivedAccountTotals
+from .signals import bookings_archived
+
+ARCHIVE_AFTER_DAYS = 90
+ARCHIVE_BATCH_SIZE = 5000
+
+
+# ------------------------------ READS ------------------------------ #
+
+def booking_selects():
+    """
+    Return (hot, cold) SELECTs over the bookings and booking_archive
+    tables with the same labelled columns: booking_id, account_id,
+    slot_id, facility_id, slot_label, the snapshots, start_time, end_time
+    and cost_charged. slot_id and slot_label are NULL for archived rows.
+    Filter either one through its .selected_columns.
+    """
+    hot = db.select(
+        Booking.booking_id, Booking.account_id, Booking.slot_id,
+        Slot.facility_id.label("facility_id"), Slot.slot_label.label("slot_label"),
+        Booking.facility_snapshot, Booking.slot_snapshot, Booking.reg_number_snapshot,
+        Booking.start_time, Booking.end_time, Booking.cost_charged
+    ).outerjoin(Slot, Slot.slot_id == Booking.slot_id)
+    cold = db.select(
+        BookingArchive.booking_id, BookingArchive.account_id, db.null().label("slot_id"),
+        BookingArchive.facility_id, db.null().label("slot_label"),
+        BookingArchive.facility_snapshot, BookingArchive.slot_snapshot, BookingArchive.reg_number_snapshot,
+        BookingArchive.start_time, BookingArchive.end_time, BookingArchive.cost_charged
+    )
+    return hot, cold
+
+
+def all_bookings():
+    """
+    Hot and archived bookings as one UNION ALL subquery. SQLite pushes
+    WHERE terms on it down into both halves, so filters still use each
+    table's indexes.
+    """
+    return db.union_all(*booking_selects()).subquery("all_bookings")
+
+
+def archived_facility_totals():
+    """{facility_id: (booking_count, revenue)} for archived bookings."""
+    return {
+        row.facility_id: (row.booking_count, row.revenue)
+        for row in db.session.scalars(db.select(ArchivedFacilityTotals))
+    }
+
+
+def archived_revenue():
+    return db.session.scalar(db.select(db.func.sum(ArchivedAccountTotals.spent))) or 0.0
+
+
+def archived_account_totals(account_id):
+    totals = db.session.get(ArchivedAccountTotals, account_id)
+    return (totals.booking_count, totals.spent) if totals else (0, 0.0)
+
+
+# ------------------------------ WRITES ------------------------------ #
+
+def _add_totals(model, key, additions):
+    """Add {id: {column: amount}} onto the summary rows, creating missing ones."""
+    if not additions:
+        return
+    stored = {getattr(row, key): row for row in db.session.scalars(
+        db.select(model).where(getattr(model, key).in_(list(additions)))
+    )}
+    for id_, amounts in additions.items():
+        row = stored.get(id_)
+        if row is None:
+            row = model(**{key: id_}, **{column: 0 for column in amounts})
+            db.session.add(row)
+        for column, amount in amounts.items():
+            setattr(row, column, getattr(row, column) + amount)
+
+
+def archive_closed_bookings(older_than_days=None, now=None, batch_size=ARCHIVE_BATCH_SIZE):
+    """
+    Move bookings closed more than older_than_days ago from bookings to
+    booking_archive, batch by batch. Each batch copies the rows, adds
+    them to the per-facility and per-account totals and deletes them
+    from bookings in one transaction. Returns the number of rows moved.
+    """
+    if older_than_days is None:
+        older_than_days = current_app.config.get("ARCHIVE_AFTER_DAYS", ARCHIVE_AFTER_DAYS)
+    cutoff = (now or datetime.utcnow()) - timedelta(days=older_than_days)
+    # The newest booking always stays hot: SQLite hands out max(rowid) + 1,
+    # so an emptied bookings table would reissue ids already archived.
+    newest = db.session.scalar(db.select(db.func.max(Booking.booking_id)))
+    if newest is None:
+        return 0
+    hot, _ = booking_selects()
+    cols = hot.selected_columns
+    moved, last_id, accounts = 0, 0, set()
+    while True:
+        rows = db.session.execute(
+            hot.where(cols.end_time < cutoff, cols.booking_id > last_id, cols.booking_id < newest)
+            .order_by(cols.booking_id).limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        db.session.execute(db.insert(BookingArchive), [{
+            "booking_id": r.booking_id,
+            "account_id": r.account_id,
+            "facility_id": r.facility_id,
+            "start_time": r.start_time,
+            "end_time": r.end_time,
+            "facility_snapshot": r.facility_snapshot,
+            "slot_snapshot": r.slot_snapshot,
+            "cost_charged": r.cost_charged,
+            "reg_number_snapshot": r.reg_number_snapshot,
+        } for r in rows])
+        by_facility, by_account = {}, {}
+        for r in rows:
+            cost = r.cost_charged or 0.0
+            if r.facility_id is not None:
+                totals = by_facility.setdefault(r.facility_id, {"booking_count": 0, "revenue": 0.0, "total_duration": 0.0})
+                totals["booking_count"] += 1
+                totals["revenue"] += cost
+                totals["total_duration"] += (r.end_time - r.start_time).total_seconds()
+            totals = by_account.setdefault(r.account_id, {"booking_count": 0, "spent": 0.0})
+            totals["booking_count"] += 1
+            totals["spent"] += cost
+        _add_totals(ArchivedFacilityTotals, "facility_id", by_facility)
+        _add_totals(ArchivedAccountTotals, "account_id", by_account)
+        db.session.execute(
+            db.delete(Booking).where(Booking.booking_id.in_([r.booking_id for r in rows])),
+            execution_options={"synchronize_session": False}
+        )
+        db.session.commit()
+        moved += len(rows)
+        last_id = rows[-1].booking_id
+        accounts.update(by_account)
+    if accounts:
+        bookings_archived.send(current_app._get_current_object(), account_ids=sorted(accounts))
+    return moved
+
+
+def detach_archived_facility(facility_id):
+    """
+    A deleted facility's archived bookings keep their snapshots but stop
+    counting towards it, as its live bookings do when their slots go.
+    """
+    db.session.execute(
+        db.update(BookingArchive).where(BookingArchive.facility_id == facility_id).values(facility_id=None)
+    )
+    db.session.execute(db.delete(ArchivedFacilityTotals).where(ArchivedFacilityTotals.facility_id == facility_id))
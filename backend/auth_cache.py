@@ -0,0 +1,191 @@
+from flask import current_app, g, has_app_context, session
+from flask_security.utils import config_value, get_request_attr, parse_auth_token, set_request_attr
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from .database import db
+from .models import Account, PermissionGroup, AccountGroupLink
+
+IDENTITY_KEY = "auth:identity:{}"
+IDENTITY_TTL = 60
+PENDING_KEY = "auth_identity_invalidations"
+WATCHED_ATTRS = ("active", "password_hash", "fs_uniquifier", "roles")
+
+
+class CachedRole:
+    """Role stand-in carrying only what the role decorators look at."""
+
+    def __init__(self, name):
+        self.name = name
+
+    def get_permissions(self):
+        return set()
+
+
+class AccountIdentity:
+    """
+    Compact authenticated user built from a cached (account_id, active,
+    roles) record. Anything else (display_name, mail, ...) loads the
+    Account row on first use.
+    """
+    is_authenticated = True
+    is_anonymous = False
+
+    def __init__(self, fs_uniquifier, account_id, active, role_names):
+        self.fs_uniquifier = fs_uniquifier
+        self.account_id = account_id
+        self.active = active
+        self.roles = [CachedRole(name) for name in role_names]
+        self._account = None
+
+    @property
+    def is_active(self):
+        return self.active
+
+    def get_id(self):
+        return self.fs_uniquifier
+
+    def has_role(self, role):
+        name = role if isinstance(role, str) else role.name
+        return any(r.name == name for r in self.roles)
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        if self._account is None:
+            self._account = db.session.get(Account, self.account_id)
+        return getattr(self._account, name)
+
+
+def _identity_ttl():
+    return current_app.config.get("AUTH_IDENTITY_TTL", IDENTITY_TTL)
+
+
+def load_identity(fs_uniquifier):
+    """
+    Return the AccountIdentity for a token/session uniquifier, reading the
+    account and its role names from the database only on a cache miss.
+    """
+    if not fs_uniquifier:
+        return None
+    cache = current_app.cache
+    key = IDENTITY_KEY.format(fs_uniquifier)
+    record = cache.get(key)
+    if record is None:
+        row = db.session.execute(
+            db.select(Account.account_id, Account.active).where(Account.fs_uniquifier == fs_uniquifier)
+        ).first()
+        if row is None:
+            return None
+        role_names = db.session.scalars(
+            db.select(PermissionGroup.name)
+            .join(AccountGroupLink, AccountGroupLink.group_id == PermissionGroup.group_id)
+            .where(AccountGroupLink.account_id == row.account_id)
+            .order_by(PermissionGroup.name)
+        ).all()
+        record = (row.account_id, row.active, tuple(role_names))
+        cache.set(key, record, timeout=_identity_ttl())
+    account_id, active, role_names = record
+    return AccountIdentity(fs_uniquifier, account_id, active, role_names)
+
+
+def invalidate_identity(*fs_uniquifiers):
+    # Not delete_many: flask_caching's stops at the first key that is not
+    # cached unless CACHE_IGNORE_ERRORS is set, leaving the rest stale.
+    cache = current_app.cache
+    for u in fs_uniquifiers:
+        if u:
+            cache.delete(IDENTITY_KEY.format(u))
+
+
+# ---------------- FLASK-LOGIN LOADERS ---------------- #
+# Same contract as Flask-Security's own _user_loader/_request_loader,
+# but backed by load_identity instead of a full Account + roles query.
+
+def session_user_loader(user_id):
+    identity = load_identity(str(user_id))
+    if identity and identity.active:
+        set_request_attr("fs_authn_via", "session")
+        set_request_attr("fs_paa", session.get("fs_paa", 0))
+        return identity
+    return None
+
+
+def token_request_loader(req):
+    if get_request_attr("fs_authn_via") == "token":
+        return g._login_user
+
+    args_key = config_value("TOKEN_AUTHENTICATION_KEY")
+    token = req.args.get(args_key, req.headers.get(config_value("TOKEN_AUTHENTICATION_HEADER")))
+    if req.is_json:
+        data = req.get_json(silent=True) or {}
+        if isinstance(data, dict):
+            token = data.get(args_key, token)
+
+    try:
+        tdata = parse_auth_token(token)
+        identity = load_identity(tdata["uid"])
+    except Exception:
+        return None
+
+    if identity and identity.active:
+        set_request_attr("fs_authn_via", "token")
+        if config_value("FRESHNESS_ALLOW_AUTH_TOKEN"):
+            set_request_attr("fs_paa", tdata.get("fs_paa", 0))
+        return identity
+    return None
+
+
+def _switchable(cached_loader, default_loader):
+    def loader(arg):
+        if current_app.config.get("AUTH_IDENTITY_CACHE", True):
+            return cached_loader(arg)
+        return default_loader(arg)
+    return loader
+
+
+def init_identity_cache(app):
+    """
+    Route Flask-Security's session and token lookups through the identity
+    cache. With AUTH_IDENTITY_CACHE off they go to Flask-Security's own
+    loaders instead; the setting is read per request, so it can be
+    flipped on a running app.
+    """
+    manager = app.login_manager
+    manager.user_loader(_switchable(session_user_loader, manager._user_callback))
+    manager.request_loader(_switchable(token_request_loader, manager._request_callback))
+
+
+# ---------------- INVALIDATION ---------------- #
+# Any flushed change to an account's active flag, password, uniquifier or
+# role links drops its cached identity once the transaction commits.
+
+@event.listens_for(Session, "after_flush")
+def _collect_identity_changes(sess, flush_context):
+    pending = sess.info.setdefault(PENDING_KEY, set())
+    link_accounts = set()
+    for obj in list(sess.dirty) + list(sess.deleted):
+        if isinstance(obj, Account):
+            state = inspect(obj)
+            if obj in sess.deleted or any(state.attrs[a].history.has_changes() for a in WATCHED_ATTRS):
+                pending.add(obj.fs_uniquifier)
+                pending.update(state.attrs.fs_uniquifier.history.deleted or ())
+        elif isinstance(obj, AccountGroupLink):
+            link_accounts.add(obj.account_id)
+    link_accounts.update(obj.account_id for obj in sess.new if isinstance(obj, AccountGroupLink))
+    link_accounts.discard(None)
+    if link_accounts:
+        pending.update(sess.connection().execute(
+            db.select(Account.fs_uniquifier).where(Account.account_id.in_(link_accounts))
+        ).scalars())
+
+
+@event.listens_for(Session, "after_commit")
+def _flush_identity_invalidations(sess):
+    pending = sess.info.pop(PENDING_KEY, None)
+    if pending and has_app_context():
+        invalidate_identity(*pending)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_identity_invalidations(sess, previous_transaction):
+    sess.info.pop(PENDING_KEY, None)
@@ -0,0 +1,155 @@
+import time
+from flask import current_app
+from .database import db
+from .models import Facility
+from .catalog import build_facility_catalog
+from .signals import slot_state_changed, facility_changed, bookings_archived
+
+FACILITY_IDS_KEY = "catalog:facility_ids:{}"
+FACILITY_ENTRY_KEY = "catalog:facility:{}:{}"
+FACILITY_GENERATION_KEY = "catalog:facility_gen:{}"
+CATALOG_STRUCTURE_KEY = "catalog:structure"
+CATALOG_VERSION_KEY = "catalog:version"
+FACILITY_VERSION_KEY = "catalog:facility_version"
+HISTORY_VERSION_KEY = "history:version:{}"
+CATALOG_CHANGE_KEY = "catalog:change:{}"
+CATALOG_CHANGE_TTL = 3600
+MAX_CATALOG_DELTA = 500
+
+
+def get_facility_catalog():
+    """
+    Return the compact facility catalog, rebuilding only the facilities
+    whose cache entries were invalidated since the last read.
+
+    Entries are keyed by a per-facility generation (and the id list by a
+    structure generation) read before the rebuild, and invalidating bumps
+    the generation instead of deleting the entry. A reader that rebuilt
+    from rows read just before a commit therefore stores its result
+    under a generation nobody reads any more.
+    """
+    cache = current_app.cache
+    ids_key = FACILITY_IDS_KEY.format(_get_counter(CATALOG_STRUCTURE_KEY))
+    facility_ids = cache.get(ids_key)
+    if facility_ids is None:
+        facility_ids = db.session.scalars(db.select(Facility.facility_id).order_by(Facility.facility_id)).all()
+        cache.add(ids_key, facility_ids)
+
+    generations = _get_counters(FACILITY_GENERATION_KEY, facility_ids)
+    keys = [FACILITY_ENTRY_KEY.format(fid, generations[fid]) for fid in facility_ids]
+    entries = dict(zip(facility_ids, cache.get_many(*keys))) if keys else {}
+    stale = [fid for fid, entry in entries.items() if entry is None]
+    if stale:
+        rebuilt = {f["id"]: f for f in build_facility_catalog(facility_ids=stale)}
+        for fid, f in rebuilt.items():
+            cache.add(FACILITY_ENTRY_KEY.format(fid, generations[fid]), f)
+        entries.update(rebuilt)
+    return [entries[fid] for fid in facility_ids if entries.get(fid) is not None]
+
+
+def get_catalog_delta(since):
+    """
+    Return the catalog changes after version `since` as
+    (version, slot_changes, facility_ids): slot_changes holds
+    [facility_id, number, state] for each reserve/release, facility_ids
+    the facilities that were edited, created or deleted. Returns None
+    when the delta cannot be built (too old, or a change record expired)
+    and the caller should send the full catalog instead.
+    """
+    version = get_catalog_version()
+    if since > version or version - since > MAX_CATALOG_DELTA:
+        return None
+    versions = range(since + 1, version + 1)
+    records = current_app.cache.get_many(*[CATALOG_CHANGE_KEY.format(v) for v in versions]) if versions else []
+    slot_changes, facility_ids = [], set()
+    for record in records:
+        if record is None:
+            return None
+        if record[0] == "slot":
+            slot_changes.append(record[1:])
+        else:
+            facility_ids.add(record[1])
+    return version, slot_changes, sorted(facility_ids)
+
+
+def _get_counter(key):
+    """
+    Return a generation counter, seeding it from the clock so it keeps
+    increasing even if the cache is flushed.
+    """
+    cache = current_app.cache
+    value = cache.get(key)
+    if value is None:
+        cache.add(key, int(time.time() * 1000), timeout=0)
+        value = cache.get(key)
+    return int(value)
+
+
+def _get_counters(key_format, ids):
+    """_get_counter for many ids with one get_many: returns {id: value}."""
+    values = current_app.cache.get_many(*[key_format.format(i) for i in ids]) if ids else []
+    return {
+        i: int(value) if value is not None else _get_counter(key_format.format(i))
+        for i, value in zip(ids, values)
+    }
+
+
+def _bump_counter(key):
+    _get_counter(key)
+    return current_app.cache.cache.inc(key)
+
+
+def get_catalog_version():
+    return _get_counter(CATALOG_VERSION_KEY)
+
+
+def bump_catalog_version():
+    return _bump_counter(CATALOG_VERSION_KEY)
+
+
+def get_history_version(account_id):
+    """
+    Return a tag that changes whenever the account's booking history
+    could render differently: its own bookings or any facility edit.
+    """
+    return f"{_get_counter(HISTORY_VERSION_KEY.format(account_id))}.{_get_counter(FACILITY_VERSION_KEY)}"
+
+
+def invalidate_facility(facility_id, structural=False):
+    """
+    Retire one facility's catalog entry and return the new catalog
+    version. Structural changes (a facility created or deleted) also
+    retire the facility id list. Retired entries expire on their own.
+    """
+    _bump_counter(FACILITY_GENERATION_KEY.format(facility_id))
+    if structural:
+        _bump_counter(CATALOG_STRUCTURE_KEY)
+    return bump_catalog_version()
+
+
+def _record_catalog_change(version, *change):
+    current_app.cache.set(CATALOG_CHANGE_KEY.format(version), list(change), timeout=CATALOG_CHANGE_TTL)
+
+
+@slot_state_changed.connect
+def _on_slot_state_changed(sender, facility_id, account_id=None, position=None, state=None, **extra):
+    version = invalidate_facility(facility_id)
+    if position is not None:
+        _record_catalog_change(version, "slot", facility_id, position, state)
+    else:
+        _record_catalog_change(version, "facility", facility_id)
+    if account_id is not None:
+        _bump_counter(HISTORY_VERSION_KEY.format(account_id))
+
+
+@facility_changed.connect
+def _on_facility_changed(sender, facility_id, action, **extra):
+    version = invalidate_facility(facility_id, structural=action in ("created", "deleted"))
+    _record_catalog_change(version, "facility", facility_id)
+    _bump_counter(FACILITY_VERSION_KEY)
+
+
+@bookings_archived.connect
+def _on_bookings_archived(sender, account_ids, **extra):
+    for account_id in account_ids:
+        _bump_counter(HISTORY_VERSION_KEY.format(account_id))
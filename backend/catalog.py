@@ -0,0 +1,56 @@
+from itertools import groupby
+from .database import db
+from .models import Facility, Slot
+
+
+def build_facility_catalog(facility_ids=None):
+    """
+    Build the compact catalog entries in two set-based queries: one for
+    the facilities and one for every slot state, ordered so the slots of
+    each facility arrive together. Slot states are packed into a single
+    string in position order ("AAOA..."). Pass facility_ids to rebuild
+    only those entries.
+    """
+    fac_query = db.select(Facility.facility_id, Facility.place_label, Facility.hourly_rate, Facility.zipcode)
+    slot_query = db.select(Slot.facility_id, Slot.slot_state)
+    if facility_ids is not None:
+        fac_query = fac_query.where(Facility.facility_id.in_(facility_ids))
+        slot_query = slot_query.where(Slot.facility_id.in_(facility_ids))
+    facilities = db.session.execute(fac_query.order_by(Facility.facility_id)).all()
+    slot_rows = db.session.execute(slot_query.order_by(Slot.facility_id, Slot.position)).all()
+
+    states_by_facility = {
+        fac_id: "".join(row.slot_state for row in rows)
+        for fac_id, rows in groupby(slot_rows, key=lambda row: row.facility_id)
+    }
+
+    result = []
+    for fac in facilities:
+        states = states_by_facility.get(fac.facility_id, "")
+        result.append({
+            "id": fac.facility_id,
+            "place_label": fac.place_label,
+            "hourly_rate": fac.hourly_rate,
+            "zipcode": fac.zipcode,
+            "total_slots": len(states),
+            "occupied_slots": states.count("O"),
+            "states": states
+        })
+    return result
+
+
+def expand_facility_entry(entry):
+    """Turn a compact catalog entry into the original per-slot /catalog/facility shape."""
+    fac_id = entry["id"]
+    return {
+        "id": fac_id,
+        "place_label": entry["place_label"],
+        "hourly_rate": entry["hourly_rate"],
+        "zipcode": entry["zipcode"],
+        "total_slots": entry["total_slots"],
+        "occupied_slots": entry["occupied_slots"],
+        "slots": [
+            {"number": idx + 1, "status": state, "facilityId": fac_id}
+            for idx, state in enumerate(entry["states"])
+        ]
+    }
@@ -1,12 +1,22 @@
-from celery import Celery, Task
-
 def celery_init_app(app):
+    from celery import Celery, Task
+    from .instrumentation import instrument_celery
+
     class FlaskTask(Task):
-        def _call_(self, *args: object, **kwargs: object):
+        def __call__(self, *args: object, **kwargs: object):
             with app.app_context():
                 return self.run(*args, **kwargs)
-    celery_app = Celery(app.name, task_cls=FlaskTask)
+    celery_app = Celery(app.name, task_cls=FlaskTask, include=["backend.tasks"])
     celery_app.config_from_object('celery_config')
     celery_app.set_default()
     app.extensions["celery"] = celery_app
-    return celery_app
\ No newline at end of file
+    instrument_celery()
+    return celery_app
+
+
+def get_celery(app):
+    """
+    The app's Celery instance, created on first use: web processes only
+    import Celery once they queue a task or look up a result.
+    """
+    return app.extensions.get("celery") or celery_init_app(app)
@@ -0,0 +1,58 @@
+import click
+from flask import current_app
+from werkzeug.security import generate_password_hash
+from .database import db
+from .models import Account, PermissionGroup
+from .migrations import upgrade_schema
+from .dashboard import ensure_metrics
+
+ADMIN_EMAIL = "astha@gmail.com"
+
+
+def init_database():
+    """
+    Create or upgrade the schema, seed the roles and the admin account
+    and populate the dashboard metrics. Safe to run repeatedly.
+    """
+    from flask_security import SQLAlchemyUserDatastore
+    db.create_all()
+    upgrade_schema()
+
+    datastore = SQLAlchemyUserDatastore(db, Account, PermissionGroup)
+    datastore.find_or_create_role(name="admin", description="System Administrator")
+    datastore.find_or_create_role(name="user", description="General user of app")
+    db.session.commit()
+
+    if not datastore.find_user(mail=ADMIN_EMAIL):
+        datastore.create_user(mail=ADMIN_EMAIL,
+                              display_name="Aastha",
+                              password_hash=generate_password_hash(
+                                  "aastha123", current_app.config.get("PASSWORD_HASH_METHOD", "scrypt")),
+                              roles=["admin"])
+    db.session.commit()
+    ensure_metrics()
+
+
+@click.command("init")
+def init_command():
+    """Create or upgrade the database and seed roles and the admin account."""
+    init_database()
+    click.echo("Database ready.")
+
+
+@click.command("seed")
+@click.option("--facilities", default=20, show_default=True)
+@click.option("--slots", default=4000, show_default=True, help="total slots across all facilities")
+@click.option("--accounts", default=1000, show_default=True)
+@click.option("--bookings", default=50000, show_default=True)
+@click.option("--seed", "rng_seed", default=42, show_default=True)
+def seed_command(facilities, slots, accounts, bookings, rng_seed):
+    """Fill the database with synthetic facilities, accounts and bookings."""
+    from .seed import seed_database
+    init_database()
+    click.echo(seed_database(facilities, slots, accounts, bookings, seed=rng_seed))
+
+
+def register_commands(app):
+    app.cli.add_command(init_command)
+    app.cli.add_command(seed_command)
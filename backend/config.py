@@ -1,12 +1,34 @@
+import os
+
 class Config():
     DEBUG = False
     SQLALCHEMY_TRACK_MODIFICATIONS = True
 
 class LocalDevelopmentConfig(Config):
-    SQLALCHEMY_DATABASE_URI = "sqlite:///smart_parking_system.sqlite3"
+    SQLALCHEMY_DATABASE_URI = os.environ.get("DATABASE_URL", "sqlite:///smart_parking_system.sqlite3")
     DEBUG = True
     SECRET_KEY = "this-is-a-secret-key"
     SECURITY_PASSWORD_HASH = "bcrypt"
     SECURITY_PASSWORD_SALT = "this-is-a-password-salt"
     WTF_CSRF_ENABLED = False 
-    SECURITY_TOKEN_AUTHENTICATION_HEADER = "Authentication-Token"
\ No newline at end of file
+    SECURITY_TOKEN_AUTHENTICATION_HEADER = "Authentication-Token"
+    CACHE_TYPE = os.environ.get("CACHE_TYPE", "RedisCache")
+    CACHE_REDIS_HOST = "localhost"
+    CACHE_REDIS_PORT = 6379
+    CACHE_REDIS_DB = 0
+    CACHE_DEFAULT_TIMEOUT = 300
+    EVENT_BROKER = os.environ.get("EVENT_BROKER", "redis")
+    AUTH_IDENTITY_CACHE = True
+    AUTH_IDENTITY_TTL = 60
+    PASSWORD_HASH_METHOD = "scrypt:32768:8:1"
+    PASSWORD_HASH_WORKERS = 2  # 0: hash on the request thread
+    PASSWORD_HASH_QUEUE = 32
+    PASSWORD_HASH_WAIT = 5
+    SLOW_REQUEST_SECONDS = 0.5
+    API_REDIRECT_BRIDGE = False
+    DASHBOARD_PROJECTION_TTL = 60
+    TARIFF_UTC_OFFSET_MINUTES = 330
+    ARCHIVE_AFTER_DAYS = 90
+    EXPORT_DIR = os.environ.get("EXPORT_DIR")  # default: <instance>/exports
+    EXPORT_TTL = 24 * 3600
+    EXPORT_CURSOR_OVERLAP = 300
\ No newline at end of file
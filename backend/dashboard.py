@@ -0,0 +1,217 @@
+import logging
+from flask import current_app
+from .database import db
+from .models import Account, Facility, Slot, Booking, FacilityMetrics, DashboardCounter
+from .pricing import project_open_bookings
+from .archive import archived_facility_totals, archived_revenue
+
+logger = logging.getLogger(__name__)
+
+PROJECTED_REVENUE_KEY = "dashboard:projected_revenue"
+PROJECTED_REVENUE_TTL = 60
+
+# Every write below joins the caller's transaction, so the metrics commit or
+# roll back together with the booking/facility change they describe.
+
+
+def _add_to_counter(name, amount):
+    updated = db.session.execute(
+        db.update(DashboardCounter).where(DashboardCounter.name == name)
+        .values(value=DashboardCounter.value + amount)
+    ).rowcount
+    if not updated:
+        db.session.add(DashboardCounter(name=name, value=amount))
+
+
+def _adjust_facility(facility_id, **deltas):
+    updated = db.session.execute(
+        db.update(FacilityMetrics).where(FacilityMetrics.facility_id == facility_id)
+        .values({getattr(FacilityMetrics, col): getattr(FacilityMetrics, col) + delta
+                 for col, delta in deltas.items()})
+    ).rowcount
+    if not updated and db.session.get(Facility, facility_id) is not None:
+        # The change being recorded is already in the session, so the row
+        # built from the source tables includes it.
+        logger.warning("No dashboard metrics for facility %s; rebuilding them", facility_id)
+        db.session.add(FacilityMetrics(facility_id=facility_id, **_expected_metrics(facility_id)[facility_id]))
+
+
+def record_reservation(facility_id):
+    _adjust_facility(facility_id, occupied_slots=1, available_slots=-1, booking_count=1)
+
+
+def record_release(facility_id, cost):
+    _adjust_facility(facility_id, occupied_slots=-1, available_slots=1, revenue=cost)
+    if cost > 0:
+        _add_to_counter("revenue", cost)
+
+
+def record_facility_created(facility_id, total_slots):
+    db.session.add(FacilityMetrics(facility_id=facility_id, available_slots=total_slots))
+
+
+def record_slots_added(facility_id, count):
+    _adjust_facility(facility_id, available_slots=count)
+
+
+def record_slots_removed(facility_id, slot_count, booking_count, revenue):
+    """
+    Record free slots being deleted. Their past bookings no longer join to
+    the facility, so they drop out of its booking count and revenue too.
+    """
+    _adjust_facility(facility_id, available_slots=-slot_count, booking_count=-booking_count, revenue=-revenue)
+
+
+def record_facility_deleted(facility_id):
+    db.session.execute(db.delete(FacilityMetrics).where(FacilityMetrics.facility_id == facility_id))
+
+
+def record_user_created():
+    _add_to_counter("users", 1)
+
+
+# ------------------------------ READS ------------------------------ #
+
+def _facility_rows():
+    return db.session.execute(
+        db.select(Facility.place_label, FacilityMetrics)
+        .join(FacilityMetrics, FacilityMetrics.facility_id == Facility.facility_id)
+        .order_by(Facility.facility_id)
+    ).all()
+
+
+def _counters():
+    return dict(db.session.execute(db.select(DashboardCounter.name, DashboardCounter.value)).all())
+
+
+def _projected_revenue():
+    """
+    What the open bookings would be charged if released now. Pricing them
+    reads every open booking, so the figure is cached for
+    DASHBOARD_PROJECTION_TTL seconds rather than recomputed per request.
+    """
+    cache = current_app.cache
+    value = cache.get(PROJECTED_REVENUE_KEY)
+    if value is None:
+        value = project_open_bookings()["repriced"]
+        cache.set(PROJECTED_REVENUE_KEY, value,
+                  timeout=current_app.config.get("DASHBOARD_PROJECTION_TTL", PROJECTED_REVENUE_TTL))
+    return value
+
+
+def dashboard_summary():
+    """Headline counts; projected_revenue is what the open bookings would be charged if released now."""
+    rows = _facility_rows()
+    counters = _counters()
+    return {
+        "total_users": int(counters.get("users", 0)),
+        "total_lots": len(rows),
+        "total_spots": sum(m.occupied_slots + m.available_slots for _, m in rows),
+        "total_revenue": round(counters.get("revenue", 0.0), 2),
+        "projected_revenue": _projected_revenue()
+    }
+
+
+def occupancy_stats():
+    return [{
+        "location_name": label,
+        "occupied_spots": m.occupied_slots,
+        "available_spots": m.available_slots
+    } for label, m in _facility_rows()]
+
+
+def revenue_per_facility():
+    return [{"location_name": label, "revenue": round(m.revenue, 2)}
+            for label, m in _facility_rows() if m.booking_count]
+
+
+# ------------------------------ RECONCILIATION ------------------------------ #
+
+def ensure_metrics():
+    """Populate the store from the source tables the first time it is used."""
+    if db.session.get(DashboardCounter, "users") is None:
+        reconcile_metrics()
+
+
+def _lock_for_write():
+    """
+    Start a transaction holding SQLite's write lock, so no other commit
+    can land between the reads that follow and the writes based on them.
+    """
+    db.session.commit()
+    connection = db.session.connection()
+    if connection.dialect.name == "sqlite":
+        connection.exec_driver_sql("BEGIN IMMEDIATE")
+
+
+def _expected_metrics(facility_id=None):
+    """The metrics of every facility (or just one) computed from the source tables and archive totals."""
+    facilities = db.select(Facility.facility_id)
+    slot_counts = db.select(Slot.facility_id, Slot.slot_state, db.func.count(Slot.slot_id))\
+        .group_by(Slot.facility_id, Slot.slot_state)
+    booking_totals = db.select(Slot.facility_id, db.func.count(Booking.booking_id), db.func.sum(Booking.cost_charged))\
+        .join(Booking, Booking.slot_id == Slot.slot_id).group_by(Slot.facility_id)
+    if facility_id is not None:
+        facilities = facilities.where(Facility.facility_id == facility_id)
+        slot_counts = slot_counts.where(Slot.facility_id == facility_id)
+        booking_totals = booking_totals.where(Slot.facility_id == facility_id)
+
+    expected = {
+        fac_id: {"occupied_slots": 0, "available_slots": 0, "booking_count": 0, "revenue": 0.0}
+        for (fac_id,) in db.session.execute(facilities)
+    }
+    for fac_id, state, count in db.session.execute(slot_counts):
+        if fac_id in expected:
+            key = "occupied_slots" if state == "O" else "available_slots"
+            expected[fac_id][key] += count
+    for fac_id, count, revenue in db.session.execute(booking_totals):
+        if fac_id in expected:
+            expected[fac_id]["booking_count"] = count
+            expected[fac_id]["revenue"] = revenue or 0.0
+    for fac_id, (count, revenue) in archived_facility_totals().items():
+        if fac_id in expected:
+            expected[fac_id]["booking_count"] += count
+            expected[fac_id]["revenue"] += revenue
+    return expected
+
+
+def reconcile_metrics():
+    """
+    Recompute every metric from the source tables and the archive
+    totals, overwrite the store and return a list of the values that had
+    drifted. The reads and the overwrite run under the write lock, so a
+    reservation or release committed meanwhile is never lost.
+    """
+    _lock_for_write()
+    expected = _expected_metrics()
+
+    drift = []
+    stored = {m.facility_id: m for m in FacilityMetrics.query.all()}
+    for fac_id, values in expected.items():
+        metrics = stored.pop(fac_id, None)
+        if metrics is None:
+            metrics = FacilityMetrics(facility_id=fac_id)
+            db.session.add(metrics)
+        for col, value in values.items():
+            current = getattr(metrics, col)
+            if current is None or abs(current - value) > 1e-6:
+                drift.append({"facility_id": fac_id, "metric": col, "stored": current, "actual": value})
+                setattr(metrics, col, value)
+    for metrics in stored.values():
+        drift.append({"facility_id": metrics.facility_id, "metric": "row", "stored": "present", "actual": None})
+        db.session.delete(metrics)
+
+    counters = _counters()
+    actual_counters = {
+        "users": db.session.scalar(db.select(db.func.count(Account.account_id))) or 0,
+        "revenue": (db.session.scalar(
+            db.select(db.func.sum(Booking.cost_charged)).where(Booking.cost_charged > 0)
+        ) or 0.0) + archived_revenue()
+    }
+    for name, value in actual_counters.items():
+        current = counters.get(name)
+        if current is None or abs(current - value) > 1e-6:
+            drift.append({"facility_id": None, "metric": name, "stored": current, "actual": value})
+            db.session.merge(DashboardCounter(name=name, value=value))
+    db.session.commit()
+    return drift
@@ -0,0 +1,28 @@
+import gzip
+import orjson
+from flask import Response, request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+MIN_COMPRESS_SIZE = 1024
+
+
+def json_response(payload, status=200):
+    """
+    Serialise with orjson and, for bodies worth it, compress with brotli
+    (when installed) or gzip according to the client's Accept-Encoding.
+    """
+    body = orjson.dumps(payload)
+    headers = {"Vary": "Accept-Encoding"}
+    if len(body) >= MIN_COMPRESS_SIZE:
+        encoding = request.accept_encodings.best_match(["br", "gzip"] if brotli else ["gzip"])
+        if encoding == "br":
+            body = brotli.compress(body, quality=4)
+        elif encoding == "gzip":
+            body = gzip.compress(body, compresslevel=5)
+        if encoding:
+            headers["Content-Encoding"] = encoding
+    return Response(body, status=status, mimetype="application/json", headers=headers)
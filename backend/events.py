@@ -0,0 +1,123 @@
+import json
+import logging
+import time
+import threading
+from queue import Queue, Empty, Full
+import redis
+from .signals import slot_state_changed, facility_changed
+
+logger = logging.getLogger(__name__)
+
+EVENTS_CHANNEL = "parking:events"
+SUBSCRIBER_QUEUE_SIZE = 256
+HEARTBEAT_SECONDS = 15
+
+
+class Subscription:
+    """One connected stream: a bounded queue of pre-formatted SSE frames."""
+
+    def __init__(self, size=SUBSCRIBER_QUEUE_SIZE, include_tasks=False):
+        self.frames = Queue(maxsize=size)
+        self.include_tasks = include_tasks
+        self.dropped = False
+
+
+class EventBroker:
+    """
+    Fans state-change events out to Server-Sent Event streams. With a
+    Redis connection, events are published on one pub/sub channel and a
+    single listener thread per process relays them to that process's
+    streams; without one, publish delivers in-process (tests, eager
+    Celery). Each event is serialised once, never per subscriber, and a
+    stream that stops draining its queue is dropped rather than allowed
+    to back up the publisher.
+    """
+
+    def __init__(self):
+        self._redis = None
+        self._listener = None
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self._redis = None
+        if app.config.get("EVENT_BROKER", "memory") == "redis":
+            self._redis = redis.Redis(
+                host=app.config.get("CACHE_REDIS_HOST", "localhost"),
+                port=app.config.get("CACHE_REDIS_PORT", 6379),
+                db=app.config.get("CACHE_REDIS_DB", 0),
+            )
+
+    def publish(self, kind, data):
+        message = json.dumps({"kind": kind, "data": data}, separators=(",", ":"))
+        if self._redis is None:
+            self._deliver(message)
+            return
+        try:
+            self._redis.publish(EVENTS_CHANNEL, message)
+        except redis.RedisError as e:
+            logger.warning("Event Publish Error: %s", e)
+
+    def _deliver(self, message):
+        event = json.loads(message)
+        kind = event["kind"]
+        frame = f"event: {kind}\ndata: {json.dumps(event['data'], separators=(',', ':'))}\n\n"
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for sub in subscribers:
+            if kind == "task" and not sub.include_tasks:
+                continue
+            try:
+                sub.frames.put_nowait(frame)
+            except Full:
+                sub.dropped = True
+                self.unsubscribe(sub)
+
+    def _listen(self):
+        while True:
+            try:
+                pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(EVENTS_CHANNEL)
+                for msg in pubsub.listen():
+                    self._deliver(msg["data"].decode())
+            except redis.RedisError as e:
+                logger.warning("Event Listener Error: %s", e)
+                time.sleep(1)
+
+    def subscribe(self, include_tasks=False):
+        sub = Subscription(include_tasks=include_tasks)
+        with self._lock:
+            self._subscribers.add(sub)
+            if self._redis is not None and self._listener is None:
+                self._listener = threading.Thread(target=self._listen, name="event-listener", daemon=True)
+                self._listener.start()
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            self._subscribers.discard(sub)
+
+    def stream(self, sub, heartbeat=HEARTBEAT_SECONDS):
+        """Yield SSE frames for a subscription until the client goes away or is dropped."""
+        try:
+            yield "retry: 3000\n\n"
+            while not sub.dropped:
+                try:
+                    yield sub.frames.get(timeout=heartbeat)
+                except Empty:
+                    yield ": keep-alive\n\n"
+        finally:
+            self.unsubscribe(sub)
+
+
+event_broker = EventBroker()
+
+
+@slot_state_changed.connect
+def _push_slot_state(sender, facility_id, slot_id, state, position=None, **extra):
+    event_broker.publish("slot", {"facility": facility_id, "slot": slot_id, "number": position, "status": state})
+
+
+@facility_changed.connect
+def _push_facility_change(sender, facility_id, action, **extra):
+    event_broker.publish("facility", {"facility": facility_id, "action": action})
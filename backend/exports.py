@@ -0,0 +1,232 @@
+import csv
+import gzip
+import hashlib
+import json
+import os
+import time
+import uuid
+from datetime import datetime, timedelta
+from flask import current_app
+from .database import db
+from .models import Account
+from .archive import booking_selects, all_bookings
+
+EXPORT_TTL = 24 * 3600
+EXPORT_PAGE_SIZE = 1000
+# A release stamps end_time before it commits, so a booking can become
+# visible with an end_time older than one an export has already passed.
+# Since-exports re-scan this many seconds before the cursor's end time.
+EXPORT_CURSOR_OVERLAP = 300
+EXPORT_HEADER = [
+    "Username", "Email", "Facility Name", "Vehicle Number",
+    "Slot Label", "Entry Time", "Exit Time", "Cost"
+]
+
+
+def parse_cursor(cursor):
+    """
+    Parse an export cursor of the form "<booking_id>:<end_time iso>;<ids>"
+    into (last_booking_id, last_end_time, exported ids). The ids are the
+    closed bookings already exported whose end_time falls in the overlap
+    window before last_end_time; the ";<ids>" part is optional. Raises
+    ValueError if malformed.
+    """
+    position, _, seen = cursor.partition(";")
+    last_id, _, last_end = position.partition(":")
+    return (int(last_id), datetime.fromisoformat(last_end) if last_end else None,
+            frozenset(int(i) for i in seen.split(",") if i))
+
+
+def format_cursor(last_id, last_end, seen=()):
+    cursor = f"{last_id}:{last_end.isoformat() if last_end else ''}"
+    return f"{cursor};{','.join(map(str, sorted(seen)))}" if seen else cursor
+
+
+def _cursor_overlap():
+    return timedelta(seconds=current_app.config.get("EXPORT_CURSOR_OVERLAP", EXPORT_CURSOR_OVERLAP))
+
+
+def _booking_filters(cols, start=None, end=None, facility_id=None, since=None):
+    """
+    Build the WHERE clauses for an export over the booking columns cols
+    (hot, archived or both). start/end are ISO dates bounding the booking
+    start time (end inclusive); since is a cursor from a previous export
+    and selects bookings created after it or closed after the start of
+    its overlap window, less those it lists as already exported.
+    """
+    clauses = []
+    if start:
+        clauses.append(cols.start_time >= datetime.fromisoformat(start))
+    if end:
+        clauses.append(cols.start_time < datetime.fromisoformat(end) + timedelta(days=1))
+    if facility_id is not None:
+        clauses.append(cols.facility_id == facility_id)
+    if since:
+        last_id, last_end, seen = parse_cursor(since)
+        changed = cols.booking_id > last_id
+        if last_end:
+            closed = cols.end_time > last_end - _cursor_overlap()
+            if seen:
+                closed = closed & cols.booking_id.not_in(seen)
+            changed = changed | closed
+        clauses.append(changed)
+    return clauses
+
+
+def export_fingerprint(**filters):
+    """
+    Return a content address for an export: the filters plus the row
+    count, highest booking id, latest end time and charged total of the
+    rows they select, and the names and emails of their accounts.
+    Closing or adding a booking, or renaming an account in the export,
+    changes the fingerprint.
+    """
+    bookings = all_bookings()
+    clauses = _booking_filters(bookings.c, **filters)
+    stats = db.session.execute(
+        db.select(
+            db.func.count(bookings.c.booking_id), db.func.max(bookings.c.booking_id),
+            db.func.max(bookings.c.end_time), db.func.sum(bookings.c.cost_charged)
+        ).where(*clauses)
+    ).one()
+    digest = hashlib.sha256(json.dumps([filters, [str(v) for v in stats]], sort_keys=True, default=str).encode())
+    accounts = db.session.execute(
+        db.select(Account.account_id, Account.display_name, Account.mail)
+        .where(Account.account_id.in_(db.select(bookings.c.account_id).where(*clauses)))
+        .order_by(Account.account_id)
+    )
+    for account in accounts:
+        digest.update(json.dumps(list(account)).encode())
+    return digest.hexdigest()[:20], stats[0]
+
+
+def _still_recent(booking_ids, window_start):
+    """Those of booking_ids (closed bookings, whose end_time no longer changes) closed after window_start."""
+    if not booking_ids:
+        return set()
+    bookings = all_bookings()
+    return set(db.session.scalars(
+        db.select(bookings.c.booking_id)
+        .where(bookings.c.booking_id.in_(booking_ids), bookings.c.end_time > window_start)
+    ))
+
+
+def export_rows(page_size=EXPORT_PAGE_SIZE, **filters):
+    """
+    Yield pages of booking rows joined to their accounts, walking the
+    archive and then the bookings table by booking_id so only one page
+    is held in memory.
+    """
+    hot, cold = booking_selects()
+    for source in (cold, hot):
+        cols = source.selected_columns
+        query = source.add_columns(Account.display_name, Account.mail)\
+            .outerjoin(Account, Account.account_id == cols.account_id)\
+            .where(*_booking_filters(cols, **filters)).order_by(cols.booking_id)
+        last_id = 0
+        while True:
+            page = db.session.execute(query.where(cols.booking_id > last_id).limit(page_size)).all()
+            if not page:
+                break
+            yield page
+            last_id = page[-1].booking_id
+
+
+def export_dir():
+    """Exports live outside static/ and are only served by the result endpoint."""
+    return current_app.config.get("EXPORT_DIR") or os.path.join(current_app.instance_path, "exports")
+
+
+def expire_exports(directory=None, max_age=None):
+    """Delete exports (and stray partial files) older than max_age seconds."""
+    directory = directory or export_dir()
+    if max_age is None:
+        max_age = current_app.config.get("EXPORT_TTL", EXPORT_TTL)
+    cutoff = time.time() - max_age
+    removed = 0
+    for entry in os.scandir(directory) if os.path.isdir(directory) else ():
+        try:
+            if entry.is_file() and entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+                removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
+
+
+def _write_atomically(path, write, opener=open):
+    """Write to a uniquely named temp file and rename it over path."""
+    tmp_path = f"{path}.{uuid.uuid4().hex}.part"
+    try:
+        with opener(tmp_path, 'wt', newline='') as f:
+            result = write(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return result
+
+
+def write_export(compress=False, progress=None, **filters):
+    """
+    Write the export for the given filters into export_dir() and return
+    (filename, cursor). Files are named by their fingerprint, so an export
+    whose rows have not changed is served from disk instead of being
+    regenerated; files older than EXPORT_TTL are deleted. progress is
+    called with (done, total) after each page.
+    """
+    directory = export_dir()
+    os.makedirs(directory, exist_ok=True)
+    expire_exports(directory)
+    fingerprint, total = export_fingerprint(**filters)
+    filename = f"booking_records_{fingerprint}.csv" + (".gz" if compress else "")
+    filepath = os.path.join(directory, filename)
+    cursor_path = filepath + ".cursor"
+    if os.path.exists(filepath) and os.path.exists(cursor_path):
+        try:
+            with open(cursor_path) as f:
+                cursor = f.read()
+            os.utime(filepath)
+            os.utime(cursor_path)
+            return filename, cursor
+        except FileNotFoundError:
+            pass
+
+    def write_rows(csvfile):
+        last_id, last_end, seen = parse_cursor(filters["since"]) if filters.get("since") else (0, None, frozenset())
+        overlap = _cursor_overlap()
+        # Closed bookings written so far that may still fall in the final overlap window.
+        recent = {}
+        done = 0
+        writer = csv.writer(csvfile)
+        writer.writerow(EXPORT_HEADER)
+        for page in export_rows(**filters):
+            writer.writerows([
+                record.display_name or "N/A",
+                record.mail or "N/A",
+                record.facility_snapshot,
+                record.reg_number_snapshot,
+                record.slot_snapshot,
+                record.start_time.strftime('%d-%m-%Y %I:%M %p'),
+                record.end_time.strftime('%d-%m-%Y %I:%M %p') if record.end_time else "Not Released",
+                record.cost_charged if record.cost_charged else "Pending"
+            ] for record in page)
+            last_id = max(last_id, page[-1].booking_id)
+            page_end = max((r.end_time for r in page if r.end_time), default=None)
+            if page_end and (last_end is None or page_end > last_end):
+                last_end = page_end
+            if last_end:
+                recent.update((r.booking_id, r.end_time) for r in page if r.end_time and r.end_time > last_end - overlap)
+                recent = {i: t for i, t in recent.items() if t > last_end - overlap}
+            done += len(page)
+            if progress:
+                progress(done, total)
+        if not last_end:
+            return format_cursor(last_id, last_end)
+        return format_cursor(last_id, last_end, set(recent) | _still_recent(seen, last_end - overlap))
+
+    cursor = _write_atomically(filepath, write_rows, gzip.open if compress else open)
+    # The cursor goes in after the export, so a reader that finds it also finds the file.
+    _write_atomically(cursor_path, lambda f: f.write(cursor))
+    return filename, cursor
@@ -0,0 +1,303 @@
+import logging
+import threading
+import time
+from bisect import bisect_left
+from flask import Response, g, has_request_context, request
+from flask_security import auth_required, roles_required
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+TASK_BUCKETS = (0.1, 0.5, 1.0, 5.0, 15.0, 60.0, 300.0, 900.0)
+SLOW_REQUEST_SECONDS = 0.5
+MAX_SAMPLED_STATEMENTS = 50
+
+
+class MetricsRegistry:
+    """
+    Process-local counters and histograms rendered in the Prometheus
+    text format. Series are keyed by (metric name, label tuple); each
+    Gunicorn/Celery process exposes its own numbers.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._help = {}
+        self._counters = {}
+        self._histograms = {}
+
+    def describe(self, name, kind, text):
+        self._help[name] = (kind, text)
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, buckets, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            series = self._histograms.get(key)
+            if series is None:
+                series = self._histograms[key] = [buckets, [0] * len(buckets), 0, 0.0]
+            idx = bisect_left(buckets, value)
+            if idx < len(buckets):
+                series[1][idx] += 1
+            series[2] += 1
+            series[3] += value
+
+    def render(self):
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(self._histograms.items(), key=lambda item: item[0])
+        lines, described = [], set()
+
+        def header(name):
+            if name not in described and name in self._help:
+                kind, text = self._help[name]
+                lines.append(f"# HELP {name} {text}")
+                lines.append(f"# TYPE {name} {kind}")
+                described.add(name)
+
+        for (name, labels), value in counters:
+            header(name)
+            lines.append(f"{name}{_format_labels(labels)} {value}")
+        for (name, labels), (buckets, counts, total, value_sum) in histograms:
+            header(name)
+            cumulative = 0
+            for bound, count in zip(buckets, counts):
+                cumulative += count
+                lines.append(f"{name}_bucket{_format_labels(labels + (('le', bound),))} {cumulative}")
+            lines.append(f"{name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {total}")
+            lines.append(f"{name}_count{_format_labels(labels)} {total}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {value_sum}")
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    parts = []
+    for key, value in labels:
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        parts.append(f'{key}="{value}"')
+    return "{" + ",".join(parts) + "}"
+
+
+metrics = MetricsRegistry()
+metrics.describe("http_requests_total", "counter", "HTTP requests by endpoint, method and status.")
+metrics.describe("http_request_duration_seconds", "histogram", "HTTP request latency by endpoint.")
+metrics.describe("http_request_queries", "histogram", "SQL statements executed per request by endpoint.")
+metrics.describe("db_queries_total", "counter", "SQL statements executed, by endpoint or task.")
+metrics.describe("db_query_seconds_total", "counter", "Time spent in SQL, by endpoint or task.")
+metrics.describe("cache_requests_total", "counter", "Application cache lookups by endpoint or task and result.")
+metrics.describe("celery_tasks_total", "counter", "Celery tasks run, by task and final state.")
+metrics.describe("celery_task_duration_seconds", "histogram", "Celery task run time by task.")
+metrics.describe("celery_task_rows_total", "counter", "Rows processed by Celery tasks.")
+metrics.describe("mail_failures_total", "counter", "Emails refused by the SMTP server, by reply code.")
+
+# Stats for the tasks running on this worker thread, innermost last: an eager
+# task can run another one inside it. Requests use flask.g.
+_task_local = threading.local()
+
+
+class _Stats:
+    __slots__ = ("scope", "started", "queries", "sql_time", "statements", "status")
+
+    def __init__(self, scope):
+        self.scope = scope
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.sql_time = 0.0
+        self.statements = []
+        self.status = None
+
+
+def _task_stack():
+    stack = getattr(_task_local, "stack", None)
+    if stack is None:
+        stack = _task_local.stack = []
+    return stack
+
+
+def _current_task_stats():
+    stack = _task_stack()
+    return stack[-1] if stack else None
+
+
+def _current_stats():
+    if has_request_context():
+        return g.get("_instrumentation")
+    return _current_task_stats()
+
+
+# ---------------- SQL ---------------- #
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("_query_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["_query_started"].pop()
+    stats = _current_stats()
+    if stats is None:
+        return
+    elapsed = time.perf_counter() - started
+    stats.queries += 1
+    stats.sql_time += elapsed
+    if len(stats.statements) < MAX_SAMPLED_STATEMENTS:
+        stats.statements.append((elapsed, statement))
+
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(context):
+    # after_cursor_execute does not run for a failed statement; drop its start time.
+    started = context.connection.info.get("_query_started") if context.connection is not None else None
+    if context.execution_context is not None and started:
+        started.pop()
+
+
+# ---------------- CACHE ---------------- #
+def _count_cache(hits, misses):
+    stats = _current_stats()
+    scope = stats.scope if stats is not None else "other"
+    if hits:
+        metrics.inc("cache_requests_total", hits, scope=scope, result="hit")
+    if misses:
+        metrics.inc("cache_requests_total", misses, scope=scope, result="miss")
+
+
+def instrument_cache(cache):
+    """
+    Wrap a flask_caching Cache's get/get_many to count hits and misses.
+    The cache object is module-level and shared by every app built in the
+    process, so it is wrapped only once.
+    """
+    if getattr(cache, "_instrumented", False):
+        return
+    get, get_many = cache.get, cache.get_many
+
+    def counted_get(*args, **kwargs):
+        value = get(*args, **kwargs)
+        _count_cache(value is not None, value is None)
+        return value
+
+    def counted_get_many(*keys):
+        values = get_many(*keys)
+        misses = sum(1 for value in values if value is None)
+        _count_cache(len(values) - misses, misses)
+        return values
+
+    cache.get, cache.get_many = counted_get, counted_get_many
+    cache._instrumented = True
+
+
+# ---------------- REQUESTS ---------------- #
+def _start_request():
+    g._instrumentation = _Stats(request.endpoint or "unmatched")
+
+
+def _note_status(response):
+    stats = g.get("_instrumentation")
+    if stats is not None:
+        stats.status = response.status_code
+    return response
+
+
+def _finish_request(exc=None):
+    """
+    Record the request on teardown, which also runs when a view raised:
+    after_request is skipped for unhandled exceptions, so those requests
+    have no status yet and count as 500s.
+    """
+    stats = g.pop("_instrumentation", None)
+    if stats is None:
+        return
+    elapsed = time.perf_counter() - stats.started
+    endpoint = stats.scope
+    status = stats.status if stats.status is not None else 500
+    metrics.inc("http_requests_total", endpoint=endpoint, method=request.method, status=status)
+    metrics.observe("http_request_duration_seconds", elapsed, LATENCY_BUCKETS, endpoint=endpoint)
+    metrics.observe("http_request_queries", stats.queries, QUERY_COUNT_BUCKETS, endpoint=endpoint)
+    _record_sql(stats)
+    if elapsed >= _slow_threshold:
+        _log_slow(f"{request.method} {request.path}", elapsed, stats)
+
+
+def _record_sql(stats):
+    if stats.queries:
+        metrics.inc("db_queries_total", stats.queries, scope=stats.scope)
+        metrics.inc("db_query_seconds_total", stats.sql_time, scope=stats.scope)
+
+
+def _log_slow(what, elapsed, stats):
+    slowest = sorted(stats.statements, key=lambda item: item[0], reverse=True)[:5]
+    logger.warning(
+        "Slow %s: %.3fs, %d queries, %.3fs in SQL. Slowest statements:\n%s",
+        what, elapsed, stats.queries, stats.sql_time,
+        "\n".join(f"  {took * 1000:.1f}ms  {statement}" for took, statement in slowest)
+    )
+
+
+# ---------------- CELERY ---------------- #
+def _start_task(task_id=None, task=None, **extra):
+    _task_stack().append(_Stats(task.name if task else "unknown"))
+
+
+def _finish_task(task_id=None, task=None, state=None, **extra):
+    stack = _task_stack()
+    if not stack:
+        return
+    stats = stack.pop()
+    elapsed = time.perf_counter() - stats.started
+    metrics.inc("celery_tasks_total", task=stats.scope, state=state or "UNKNOWN")
+    metrics.observe("celery_task_duration_seconds", elapsed, TASK_BUCKETS, task=stats.scope)
+    _record_sql(stats)
+    if elapsed >= _slow_threshold:
+        _log_slow(f"task {stats.scope}", elapsed, stats)
+
+
+def instrument_celery():
+    """Time Celery tasks in this process; called when the Celery app is created."""
+    from celery.signals import task_prerun, task_postrun
+    task_prerun.connect(_start_task, weak=False)
+    task_postrun.connect(_finish_task, weak=False)
+
+
+def record_task_rows(count):
+    """Count rows processed by the running Celery task."""
+    stats = _current_task_stats()
+    if stats is not None and count:
+        metrics.inc("celery_task_rows_total", count, task=stats.scope)
+
+
+def record_mail_failures(failed):
+    """Count refused emails, given (address, smtp_code, reply) tuples."""
+    for _, code, _ in failed:
+        metrics.inc("mail_failures_total", code=code)
+
+
+# ---------------- SETUP ---------------- #
+_slow_threshold = SLOW_REQUEST_SECONDS
+
+
+@auth_required("token")
+@roles_required("admin")
+def metrics_view():
+    """Prometheus scrape endpoint; scrape with an admin Authentication-Token header."""
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+
+def init_instrumentation(app, cache):
+    """Hook request timing, SQL and cache counters into the app and expose /metrics."""
+    global _slow_threshold
+    _slow_threshold = app.config.get("SLOW_REQUEST_SECONDS", SLOW_REQUEST_SECONDS)
+    app.before_request(_start_request)
+    app.after_request(_note_status)
+    app.teardown_request(_finish_request)
+    instrument_cache(cache)
+    app.add_url_rule("/metrics", "metrics", metrics_view)
@@ -1,4 +1,6 @@
+import logging
 import smtplib
+from queue import LifoQueue, Empty, Full
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from email.mime.base import MIMEBase
@@ -9,9 +11,118 @@ SMTP_SERVER_HOST = "localhost"
 SMTP_SERVER_PORT = 1025
 SENDER_ADDRESS = "parkinglot@donotreply.in"
 SENDER_PASSWORD = ""
+SMTP_POOL_SIZE = 4
 
-def send_email(to_address, subject, message, content="html", attachment_file=None):
-    print("Preparing email to:", to_address)
+logger = logging.getLogger(__name__)
+
+
+class MailBatchInterrupted(Exception):
+    """
+    The SMTP connection failed partway through a batch and could not be
+    reopened. `processed` messages at the start of the batch were already
+    sent or refused, so a retry should resume after them.
+    """
+
+    def __init__(self, processed, cause):
+        super().__init__(processed, str(cause))
+        self.processed = processed
+
+    def __str__(self):
+        return f"SMTP connection lost after {self.args[0]} messages: {self.args[1]}"
+
+
+class SMTPConnectionPool:
+    """
+    Pool of persistent SMTP sessions. A batch of messages is sent over one
+    session instead of a connect/quit per message; a session that drops
+    is reopened and the failed message retried once. A message the
+    server refuses is recorded and skipped, so one bad address does not
+    fail the rest of the batch.
+    """
+
+    def __init__(self, host=SMTP_SERVER_HOST, port=SMTP_SERVER_PORT, size=SMTP_POOL_SIZE):
+        self.host = host
+        self.port = port
+        self._idle = LifoQueue(maxsize=size)
+
+    def _connect(self):
+        conn = smtplib.SMTP(host=self.host, port=self.port)
+        if SENDER_PASSWORD:
+            conn.login(SENDER_ADDRESS, SENDER_PASSWORD)
+        return conn
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except Empty:
+            return self._connect()
+
+    def _release(self, conn):
+        try:
+            self._idle.put_nowait(conn)
+        except Full:
+            self._discard(conn)
+
+    def _discard(self, conn):
+        try:
+            conn.quit()
+        except (smtplib.SMTPException, OSError):
+            pass
+
+    def _send_one(self, conn, msg, failed):
+        try:
+            conn.send_message(msg)
+            return True
+        except smtplib.SMTPRecipientsRefused as e:
+            for address, (code, reply) in e.recipients.items():
+                failed.append((address, code, reply.decode(errors="replace")))
+        except smtplib.SMTPResponseException as e:
+            failed.append((msg["To"], e.smtp_code, e.smtp_error.decode(errors="replace")))
+        logger.warning("SMTP refused message to %s: %s", msg["To"], failed[-1][1:])
+        return False
+
+    def send_messages(self, messages):
+        """
+        Send MIME messages over one pooled session. Returns (sent, failed)
+        where failed lists (address, smtp_code, reply) for each refusal.
+        Raises MailBatchInterrupted if the server cannot be reached.
+        """
+        sent, processed, failed = 0, 0, []
+        try:
+            conn = self._acquire()
+        except (smtplib.SMTPException, OSError) as e:
+            raise MailBatchInterrupted(0, e) from e
+        try:
+            for msg in messages:
+                try:
+                    ok = self._send_one(conn, msg, failed)
+                except (smtplib.SMTPServerDisconnected, ConnectionError):
+                    self._discard(conn)
+                    conn = self._connect()
+                    ok = self._send_one(conn, msg, failed)
+                sent += ok
+                processed += 1
+        except (smtplib.SMTPException, OSError) as e:
+            self._discard(conn)
+            raise MailBatchInterrupted(processed, e) from e
+        except Exception:
+            self._discard(conn)
+            raise
+        self._release(conn)
+        return sent, failed
+
+    def close(self):
+        while True:
+            try:
+                self._discard(self._idle.get_nowait())
+            except Empty:
+                return
+
+
+smtp_pool = SMTPConnectionPool()
+
+
+def build_message(to_address, subject, message, content="html", attachment_file=None):
     msg = MIMEMultipart()
     msg['From'] = SENDER_ADDRESS
     msg['To'] = to_address
@@ -23,18 +134,25 @@ def send_email(to_address, subject, message, content="html", attachment_file=Non
         msg.attach(MIMEText(message, "plain"))
 
     if attachment_file:
-        print("📎 Attaching file:", attachment_file)
         with open(attachment_file, 'rb') as attachment:
             part = MIMEBase("application", "octet-stream")
             part.set_payload(attachment.read())
             encoders.encode_base64(part)
             part.add_header("Content-Disposition", f"attachment; filename={attachment_file}")
             msg.attach(part)
+    return msg
+
+
+def send_email(to_address, subject, message, content="html", attachment_file=None):
+    msg = build_message(to_address, subject, message, content, attachment_file)
+    sent, _ = smtp_pool.send_messages([msg])
+    return bool(sent)
 
-    print("Sending email via localhost:1025...")
-    s = smtplib.SMTP(host=SMTP_SERVER_HOST, port=SMTP_SERVER_PORT)
-    s.send_message(msg)
-    s.quit()
-    print("Email sent.")
 
-    return True
+def send_bulk_email(emails):
+    """
+    Send a batch of emails, each a dict with to_address, subject, message
+    and optionally content, over one pooled SMTP session. Returns
+    (sent, failed) as SMTPConnectionPool.send_messages does.
+    """
+    return smtp_pool.send_messages(build_message(**email) for email in emails)
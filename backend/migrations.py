@@ -0,0 +1,24 @@
+from sqlalchemy import inspect, text
+from .database import db
+from .models import AccountGroupLink, Facility, Slot, Booking, BookingArchive
+from .provisioning import renumber_slot_positions
+
+
+def upgrade_schema():
+    """
+    Bring an existing database up to the current models: add columns that
+    db.create_all() cannot add to existing tables, backfill them and
+    create any missing indexes. Safe to run repeatedly.
+    """
+    engine = db.engine
+    slot_columns = {col["name"] for col in inspect(engine).get_columns(Slot.__tablename__)}
+    if "position" not in slot_columns:
+        with engine.begin() as conn:
+            conn.execute(text("ALTER TABLE slots ADD COLUMN position INTEGER"))
+        for (facility_id,) in db.session.execute(db.select(Facility.facility_id)):
+            renumber_slot_positions(facility_id)
+        db.session.commit()
+
+    for model in (AccountGroupLink, Slot, Booking, BookingArchive):
+        for index in model.__table__.indexes:
+            index.create(bind=engine, checkfirst=True)
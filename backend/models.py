@@ -27,6 +27,9 @@ class PermissionGroup(db.Model, RoleMixin):
 
 class AccountGroupLink(db.Model):
     __tablename__ = "account_group_link"
+    __table_args__ = (
+        db.Index("ix_account_group_link_account_group", "account_id", "group_id"),
+    )
     link_id = db.Column(db.Integer, primary_key=True)
     account_id = db.Column(db.Integer, db.ForeignKey("accounts.account_id"))
     group_id = db.Column(db.Integer, db.ForeignKey("permission_groups.group_id"))
@@ -43,18 +46,37 @@ class Facility(db.Model):
     total_slots = db.Column(db.Integer, nullable=False)
 
     slot_list = db.relationship("Slot", backref="facility_ref", lazy=True, cascade="all, delete")
+    tariff = db.relationship("Tariff", uselist=False, lazy=True, cascade="all, delete-orphan")
+
+
+class Tariff(db.Model):
+    """
+    Optional pricing rules on top of a facility's hourly rate. bands is a
+    list of [start_hour, end_hour, multiplier] in local time (end
+    exclusive, may wrap past midnight); daily_cap limits each 24 hours.
+    """
+    __tablename__ = "tariffs"
+    facility_id = db.Column(db.Integer, db.ForeignKey("facilities.facility_id"), primary_key=True)
+    grace_minutes = db.Column(db.Integer, nullable=False, default=0)
+    daily_cap = db.Column(db.Float)
+    bands = db.Column(db.JSON, nullable=False, default=list)
 
 
 # SLOT (PARKING SPACE) MODELS
 
 class Slot(db.Model):
     __tablename__ = "slots"
+    __table_args__ = (
+        db.Index("ix_slots_facility_state", "facility_id", "slot_state"),
+        db.Index("ix_slots_facility_position", "facility_id", "position"),
+    )
     slot_id = db.Column(db.Integer, primary_key=True)
     facility_id = db.Column(db.Integer, db.ForeignKey("facilities.facility_id"), nullable=False)
     slot_state = db.Column(db.String(1), default="A")
     assigned_user = db.Column(db.Integer)
     reg_number = db.Column(db.String(20))
     slot_label = db.Column(db.String(20))
+    position = db.Column(db.Integer)
 
     booking_records = db.relationship("Booking", backref="slot_ref", lazy=True)
 
@@ -63,6 +85,12 @@ class Slot(db.Model):
 
 class Booking(db.Model):
     __tablename__ = "bookings"
+    __table_args__ = (
+        db.Index("ix_bookings_slot_account_end", "slot_id", "account_id", "end_time"),
+        db.Index("ix_bookings_account_start", "account_id", "start_time"),
+        db.Index("ix_bookings_account_booking", "account_id", "booking_id"),
+        db.Index("ix_bookings_end_time", "end_time"),
+    )
     booking_id = db.Column(db.Integer, primary_key=True)
     account_id = db.Column(db.Integer, db.ForeignKey("accounts.account_id"), nullable=False)
     slot_id = db.Column(db.Integer, db.ForeignKey("slots.slot_id"), nullable=True)
@@ -72,3 +100,73 @@ class Booking(db.Model):
     slot_snapshot = db.Column(db.String(20))
     cost_charged = db.Column(db.Float, default=0.0)
     reg_number_snapshot = db.Column(db.String(20), nullable=False)
+
+
+# ARCHIVED (COLD) BOOKING MODELS
+
+class BookingArchive(db.Model):
+    """
+    Closed bookings moved out of the bookings table. Rows keep their
+    booking_id and record the facility they belonged to instead of the
+    slot, so they survive slot renumbering and deletion.
+    """
+    __tablename__ = "booking_archive"
+    __table_args__ = (
+        db.Index("ix_booking_archive_account_start", "account_id", "start_time"),
+        db.Index("ix_booking_archive_account_booking", "account_id", "booking_id"),
+        db.Index("ix_booking_archive_facility", "facility_id"),
+    )
+    booking_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    account_id = db.Column(db.Integer, nullable=False)
+    facility_id = db.Column(db.Integer)
+    start_time = db.Column(db.DateTime, nullable=False)
+    end_time = db.Column(db.DateTime, nullable=False)
+    facility_snapshot = db.Column(db.String(120))
+    slot_snapshot = db.Column(db.String(20))
+    cost_charged = db.Column(db.Float, default=0.0)
+    reg_number_snapshot = db.Column(db.String(20), nullable=False)
+
+
+class ArchivedFacilityTotals(db.Model):
+    __tablename__ = "archived_facility_totals"
+    facility_id = db.Column(db.Integer, primary_key=True)
+    booking_count = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0.0)
+    total_duration = db.Column(db.Float, nullable=False, default=0.0)
+
+
+class ArchivedAccountTotals(db.Model):
+    __tablename__ = "archived_account_totals"
+    account_id = db.Column(db.Integer, primary_key=True)
+    booking_count = db.Column(db.Integer, nullable=False, default=0)
+    spent = db.Column(db.Float, nullable=False, default=0.0)
+
+
+# DASHBOARD METRICS MODELS
+
+class FacilityMetrics(db.Model):
+    __tablename__ = "facility_metrics"
+    facility_id = db.Column(db.Integer, db.ForeignKey("facilities.facility_id"), primary_key=True)
+    occupied_slots = db.Column(db.Integer, nullable=False, default=0)
+    available_slots = db.Column(db.Integer, nullable=False, default=0)
+    booking_count = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0.0)
+
+
+class DashboardCounter(db.Model):
+    __tablename__ = "dashboard_counters"
+    name = db.Column(db.String(50), primary_key=True)
+    value = db.Column(db.Float, nullable=False, default=0.0)
+
+
+# ANALYTICS ROLLUP MODELS
+
+class BookingRollup(db.Model):
+    __tablename__ = "booking_rollups"
+    facility_id = db.Column(db.Integer, primary_key=True)
+    granularity = db.Column(db.String(5), primary_key=True)
+    bucket_start = db.Column(db.DateTime, primary_key=True)
+    revenue = db.Column(db.Float, nullable=False, default=0.0)
+    booking_count = db.Column(db.Integer, nullable=False, default=0)
+    total_duration = db.Column(db.Float, nullable=False, default=0.0)
+    peak_occupancy = db.Column(db.Integer, nullable=False, default=0)
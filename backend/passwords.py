@@ -0,0 +1,94 @@
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from threading import BoundedSemaphore, Lock
+from werkzeug.security import generate_password_hash, check_password_hash
+
+PASSWORD_HASH_METHOD = "scrypt:32768:8:1"
+PASSWORD_HASH_WORKERS = min(os.cpu_count() or 1, 4)
+PASSWORD_HASH_QUEUE = 32
+PASSWORD_HASH_WAIT = 5
+
+
+class HasherBusy(Exception):
+    """Raised when the hashing pool is saturated and the caller should retry later."""
+
+
+def _generate(password, method):
+    return generate_password_hash(password, method=method)
+
+
+def _check(pwhash, password):
+    return check_password_hash(pwhash, password)
+
+
+class PasswordHasher:
+    """
+    Runs password hashing in a small process pool so the CPU-bound work
+    stays off the request threads. At most `queue_size` hashes may be in
+    flight; past that, callers wait up to `wait` seconds for a slot and
+    then get HasherBusy instead of piling up behind the pool. With
+    `workers` set to 0 the hashes run inline on the calling thread, under
+    the same in-flight limit.
+    """
+
+    def __init__(self, method=PASSWORD_HASH_METHOD, workers=PASSWORD_HASH_WORKERS,
+                 queue_size=PASSWORD_HASH_QUEUE, wait=PASSWORD_HASH_WAIT):
+        self.configure(method, workers, queue_size, wait)
+        self._executor = None
+        self._executor_lock = Lock()
+
+    def configure(self, method, workers, queue_size, wait):
+        self.method = method
+        self.workers = workers
+        self.wait = wait
+        self._slots = BoundedSemaphore(queue_size)
+
+    def init_app(self, app):
+        self.configure(
+            app.config.get("PASSWORD_HASH_METHOD", PASSWORD_HASH_METHOD),
+            app.config.get("PASSWORD_HASH_WORKERS", PASSWORD_HASH_WORKERS),
+            app.config.get("PASSWORD_HASH_QUEUE", PASSWORD_HASH_QUEUE),
+            app.config.get("PASSWORD_HASH_WAIT", PASSWORD_HASH_WAIT),
+        )
+
+    def _pool(self):
+        with self._executor_lock:
+            if self._executor is None:
+                # The pool starts on the first login, when request threads are
+                # already running, so its workers must not be forked from this
+                # process. forkserver/spawn children re-import __main__, which
+                # is harmless now that app.py only builds apps when run directly.
+                methods = multiprocessing.get_all_start_methods()
+                context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+            return self._executor
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(timeout=self.wait):
+            raise HasherBusy()
+        try:
+            if not self.workers:
+                return fn(*args)
+            return self._pool().submit(fn, *args).result()
+        finally:
+            self._slots.release()
+
+    def hash(self, password):
+        return self._run(_generate, password, self.method)
+
+    def verify(self, pwhash, password):
+        return self._run(_check, pwhash, password)
+
+    def needs_rehash(self, pwhash):
+        """True when a stored hash was made with a different method or cost."""
+        return pwhash.split("$", 1)[0] != self.method
+
+    def close(self):
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,189 @@
+from datetime import datetime
+from math import ceil
+from flask import current_app
+from .database import db
+from .models import Facility, Slot, Booking, Tariff
+from .archive import all_bookings
+
+TARIFF_UTC_OFFSET_MINUTES = 330
+PRICING_CHUNK = 200000
+EPOCH = datetime(1970, 1, 1)
+
+
+class TariffSchedule:
+    """
+    How a facility charges a stay. A stay is billed per started hour
+    (at least one) at hourly_rate times the multiplier of the local
+    time-of-day band the billed hour starts in. Each 24-hour period of
+    the stay is capped at daily_cap, and stays no longer than the grace
+    period are free. With no bands, cap or grace this is the original
+    ceil(hours) * hourly_rate.
+    """
+
+    def __init__(self, hourly_rate, grace_minutes=0, daily_cap=None, bands=(), utc_offset_minutes=None):
+        self.hourly_rate = float(hourly_rate)
+        self.grace_seconds = int(grace_minutes or 0) * 60
+        self.daily_cap = float(daily_cap) if daily_cap is not None else None
+        self.offset_seconds = int(TARIFF_UTC_OFFSET_MINUTES if utc_offset_minutes is None else utc_offset_minutes) * 60
+        multipliers = [1.0] * 24
+        for start_hour, end_hour, multiplier in bands or ():
+            hour = int(start_hour) % 24
+            while True:
+                multipliers[hour] = float(multiplier)
+                hour = (hour + 1) % 24
+                if hour == int(end_hour) % 24:
+                    break
+        self.multipliers = multipliers
+        self._day_weight = sum(multipliers)
+        self._cycle_prefix = None
+
+    def _capped(self, amount):
+        return min(amount, self.daily_cap) if self.daily_cap is not None else amount
+
+    def charge(self, start, end):
+        """Charge for one stay, computed hour by hour."""
+        seconds = (end - start).total_seconds()
+        if self.grace_seconds and seconds <= self.grace_seconds:
+            return 0.0
+        hours = max(ceil(seconds / 3600), 1)
+        first_hour = int(((start - EPOCH).total_seconds() + self.offset_seconds) % 86400 // 3600)
+        total, day_total = 0.0, 0.0
+        for i in range(hours):
+            if i and i % 24 == 0:
+                total += self._capped(day_total)
+                day_total = 0.0
+            day_total += self.hourly_rate * self.multipliers[(first_hour + i) % 24]
+        return round(total + self._capped(day_total), 2)
+
+    def charge_many(self, starts, ends):
+        """
+        Vectorised charge() over arrays of epoch seconds. Every full
+        24-hour period covers each hour of the day once, so only the
+        partial last period needs the per-hour multipliers, looked up
+        from a prefix-sum table. NumPy is imported here rather than at
+        module level so releasing a booking never loads it.
+        """
+        import numpy as np
+        if self._cycle_prefix is None:
+            # cycle_prefix[h][k]: sum of multipliers for k hours starting at hour h
+            self._cycle_prefix = np.zeros((24, 25))
+            for h in range(24):
+                self._cycle_prefix[h, 1:] = np.cumsum([self.multipliers[(h + k) % 24] for k in range(24)])
+        starts = np.asarray(starts, dtype=np.float64)
+        seconds = np.asarray(ends, dtype=np.float64) - starts
+        hours = np.maximum(np.ceil(seconds / 3600), 1).astype(np.int64)
+        full_days, rest = np.divmod(hours, 24)
+        first_hour = (((starts + self.offset_seconds) % 86400) // 3600).astype(np.int64)
+        full_day = self.hourly_rate * self._day_weight
+        partial = self.hourly_rate * self._cycle_prefix[first_hour, rest]
+        if self.daily_cap is not None:
+            full_day = min(full_day, self.daily_cap)
+            partial = np.minimum(partial, self.daily_cap)
+        charges = np.round(full_days * full_day + partial, 2)
+        if self.grace_seconds:
+            charges[seconds <= self.grace_seconds] = 0.0
+        return charges
+
+
+def _to_epoch(moment):
+    return (moment - EPOCH).total_seconds()
+
+
+def schedule_from(hourly_rate, tariff=None):
+    offset = current_app.config.get("TARIFF_UTC_OFFSET_MINUTES", TARIFF_UTC_OFFSET_MINUTES)
+    if tariff is None:
+        return TariffSchedule(hourly_rate, utc_offset_minutes=offset)
+    return TariffSchedule(hourly_rate, tariff.grace_minutes, tariff.daily_cap, tariff.bands, offset)
+
+
+def schedule_for(facility_id):
+    """The facility's current tariff, or plain hourly billing if it has none."""
+    hourly_rate = db.session.scalar(db.select(Facility.hourly_rate).where(Facility.facility_id == facility_id))
+    return schedule_from(hourly_rate, db.session.get(Tariff, facility_id))
+
+
+def _schedules():
+    tariffs = {t.facility_id: t for t in Tariff.query.all()}
+    return {
+        fac_id: schedule_from(rate, tariffs.get(fac_id))
+        for fac_id, rate in db.session.execute(db.select(Facility.facility_id, Facility.hourly_rate))
+    }
+
+
+def _price_rows(query, schedule_by_facility):
+    """
+    Stream (facility_id, start, end, cost) rows in chunks and price each
+    facility's share with charge_many. Returns {facility_id: (count,
+    charged, repriced)}.
+    """
+    import numpy as np
+    totals = {}
+    result = db.session.execute(query.execution_options(yield_per=PRICING_CHUNK))
+    for chunk in result.partitions():
+        columns = np.array([(f, _to_epoch(s), _to_epoch(e), c or 0.0) for f, s, e, c in chunk], dtype=np.float64)
+        for fac_id in np.unique(columns[:, 0]).astype(int):
+            schedule = schedule_by_facility.get(fac_id)
+            if schedule is None:
+                continue
+            rows = columns[columns[:, 0] == fac_id]
+            count, charged, repriced = totals.get(fac_id, (0, 0.0, 0.0))
+            totals[fac_id] = (
+                count + len(rows),
+                charged + float(rows[:, 3].sum()),
+                repriced + float(schedule.charge_many(rows[:, 1], rows[:, 2]).sum()),
+            )
+    return totals
+
+
+def rerate_bookings(proposed=None, facility_id=None, start=None, end=None):
+    """
+    What-if re-rating of closed bookings, hot and archived (optionally
+    one facility and a start-time range) under proposed schedules
+    ({facility_id: TariffSchedule}, defaulting to the current ones).
+    Returns per-facility booking counts, amounts charged and amounts
+    under the proposal.
+    """
+    schedules = _schedules()
+    schedules.update(proposed or {})
+    bookings = all_bookings()
+    query = db.select(bookings.c.facility_id, bookings.c.start_time, bookings.c.end_time, bookings.c.cost_charged)\
+        .where(bookings.c.facility_id.is_not(None), bookings.c.end_time.is_not(None))
+    if facility_id is not None:
+        query = query.where(bookings.c.facility_id == facility_id)
+    if start is not None:
+        query = query.where(bookings.c.start_time >= start)
+    if end is not None:
+        query = query.where(bookings.c.start_time < end)
+    return _report(_price_rows(query, schedules))
+
+
+def project_open_bookings(proposed=None, facility_id=None, at=None):
+    """
+    Price every open booking as if it were released at `at` (default
+    now), under the current or proposed schedules.
+    """
+    schedules = _schedules()
+    schedules.update(proposed or {})
+    at = at or datetime.utcnow()
+    query = db.select(Slot.facility_id, Booking.start_time, db.literal(at), Booking.cost_charged)\
+        .join(Slot, Slot.slot_id == Booking.slot_id).where(Booking.end_time.is_(None))
+    if facility_id is not None:
+        query = query.where(Slot.facility_id == facility_id)
+    return _report(_price_rows(query, schedules))
+
+
+def _report(totals):
+    facilities = [{
+        "facility_id": fac_id,
+        "bookings": count,
+        "charged": round(charged, 2),
+        "repriced": round(repriced, 2),
+        "difference": round(repriced - charged, 2)
+    } for fac_id, (count, charged, repriced) in sorted(totals.items())]
+    return {
+        "bookings": sum(f["bookings"] for f in facilities),
+        "charged": round(sum(f["charged"] for f in facilities), 2),
+        "repriced": round(sum(f["repriced"] for f in facilities), 2),
+        "difference": round(sum(f["difference"] for f in facilities), 2),
+        "facilities": facilities
+    }
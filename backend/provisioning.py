@@ -0,0 +1,88 @@
+from .database import db
+from .models import Slot, Booking
+
+
+def renumber_slot_positions(facility_id):
+    """
+    Rewrite the stored 1-based positions of a facility's slots in slot_id
+    order with a single UPDATE ... FROM.
+    """
+    ranked = db.select(
+        Slot.slot_id, db.func.row_number().over(order_by=Slot.slot_id).label("pos")
+    ).where(Slot.facility_id == facility_id).subquery()
+    db.session.execute(
+        db.update(Slot).where(Slot.slot_id == ranked.c.slot_id).values(position=ranked.c.pos),
+        execution_options={"synchronize_session": False}
+    )
+
+
+def provision_slots(facility_id, count, first_position=1):
+    """
+    Insert count free slots for a facility in one executemany INSERT.
+    Labels continue from the highest numeric label already in use. The
+    labels are read as one column and compared in Python, since SQL has
+    no portable "is numeric" test.
+    """
+    if count <= 0:
+        return 0
+    labels = db.session.scalars(db.select(Slot.slot_label).where(Slot.facility_id == facility_id))
+    highest_label = max((int(label) for label in labels if label and label.isdigit()), default=0)
+    db.session.execute(db.insert(Slot), [
+        {
+            "facility_id": facility_id,
+            "slot_label": str(highest_label + i + 1),
+            "slot_state": "A",
+            "position": first_position + i
+        }
+        for i in range(count)
+    ])
+    return count
+
+
+def free_slots_to_remove(facility_id, count):
+    """
+    Return the ids of the count highest-positioned free slots of a
+    facility, or None if it does not have that many.
+    """
+    slot_ids = db.session.scalars(
+        db.select(Slot.slot_id).where(Slot.facility_id == facility_id, Slot.slot_state == "A")
+        .order_by(Slot.position.desc()).limit(count)
+    ).all()
+    return slot_ids if len(slot_ids) == count else None
+
+
+def _detach_and_delete(slot_filter):
+    # Bookings keep their snapshots but lose the slot link, as the ORM
+    # delete cascade did before.
+    doomed = db.select(Slot.slot_id).where(slot_filter)
+    db.session.execute(
+        db.update(Booking).where(Booking.slot_id.in_(doomed)).values(slot_id=None),
+        execution_options={"synchronize_session": False}
+    )
+    db.session.execute(db.delete(Slot).where(slot_filter), execution_options={"synchronize_session": False})
+
+
+def remove_slots(facility_id, slot_ids):
+    """
+    Delete those of slot_ids that are still free in bulk and renumber the
+    remaining positions. A slot reserved since it was picked is left in
+    place. Returns (slots deleted, bookings detached, their revenue) for
+    the dashboard metrics.
+    """
+    still_free = Slot.slot_id.in_(slot_ids) & (Slot.slot_state == "A")
+    # The UPDATE takes the write lock, so the DELETE sees the same free slots.
+    costs = db.session.scalars(
+        db.update(Booking).where(Booking.slot_id.in_(db.select(Slot.slot_id).where(still_free)))
+        .values(slot_id=None).returning(Booking.cost_charged),
+        execution_options={"synchronize_session": False}
+    ).all()
+    deleted = db.session.execute(
+        db.delete(Slot).where(still_free), execution_options={"synchronize_session": False}
+    ).rowcount
+    renumber_slot_positions(facility_id)
+    return deleted, len(costs), sum(cost or 0.0 for cost in costs)
+
+
+def remove_facility_slots(facility_id):
+    """Delete every slot of a facility in bulk, ahead of deleting the facility."""
+    _detach_and_delete(Slot.facility_id == facility_id)
@@ -0,0 +1,169 @@
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from flask import current_app
+from .database import db
+from .models import Booking, BookingRollup, DashboardCounter
+from .archive import all_bookings
+from .pricing import TARIFF_UTC_OFFSET_MINUTES
+
+GRANULARITIES = ("hour", "day", "month")
+WATERMARK_COUNTER = "rollup_watermark"
+OFFSET_COUNTER = "rollup_utc_offset_minutes"
+EPOCH = datetime(1970, 1, 1)
+UTC = timedelta(0)
+
+# Bookings are stored in naive UTC, but days and months are the local ones
+# (TARIFF_UTC_OFFSET_MINUTES ahead of UTC, as for the tariff bands). Bucket
+# starts are stored as the UTC instant of the local boundary.
+
+
+def _utc_offset():
+    return timedelta(minutes=current_app.config.get("TARIFF_UTC_OFFSET_MINUTES", TARIFF_UTC_OFFSET_MINUTES))
+
+
+def bucket_start(moment, granularity, offset=UTC):
+    local = moment + offset
+    if granularity == "hour":
+        local = local.replace(minute=0, second=0, microsecond=0)
+    elif granularity == "day":
+        local = local.replace(hour=0, minute=0, second=0, microsecond=0)
+    else:
+        local = local.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    return local - offset
+
+
+def next_bucket(start, granularity, offset=UTC):
+    if granularity == "hour":
+        return start + timedelta(hours=1)
+    if granularity == "day":
+        return start + timedelta(days=1)
+    local = start + offset
+    return local.replace(year=local.year + local.month // 12, month=local.month % 12 + 1) - offset
+
+
+def _peak_occupancy(intervals, granularity, window_start, now, offset=UTC):
+    """
+    Sweep the (start, end) intervals of one facility and return the
+    highest number of simultaneous bookings seen in each bucket.
+    """
+    events = sorted(
+        [(start, 1) for start, _ in intervals] +
+        [(end or now, -1) for _, end in intervals],
+        key=lambda event: (event[0], event[1])
+    )
+    peaks = defaultdict(int)
+    current, last_bucket = 0, None
+    for moment, delta in events:
+        bucket = bucket_start(max(moment, window_start), granularity, offset)
+        if current and last_bucket is not None:
+            # Buckets spanned without any event keep the running occupancy.
+            spanned = next_bucket(last_bucket, granularity, offset)
+            while spanned < bucket:
+                peaks[spanned] = max(peaks[spanned], current)
+                spanned = next_bucket(spanned, granularity, offset)
+        # Occupancy carried into this bucket counts before the event applies.
+        peaks[bucket] = max(peaks[bucket], current, current + delta)
+        current += delta
+        last_bucket = bucket
+    return peaks
+
+
+def refresh_rollups(now=None):
+    """
+    Rebuild the rollup buckets touched since the last run. The window
+    starts at the month of the last run, or earlier if a booking closed
+    since then started before it, so closing an old booking re-rates its
+    buckets. Archived bookings are read too, so a full rebuild covers them;
+    only the hot table can change after the watermark. A change of the
+    local UTC offset moves every bucket boundary and rebuilds them all.
+    Returns the number of rollup rows written.
+    """
+    now = now or datetime.utcnow()
+    offset = _utc_offset()
+    offset_minutes = offset.total_seconds() / 60
+    watermark_value = db.session.get(DashboardCounter, WATERMARK_COUNTER)
+    stored_offset = db.session.get(DashboardCounter, OFFSET_COUNTER)
+    if watermark_value is not None and (stored_offset is None or stored_offset.value != offset_minutes):
+        db.session.execute(db.delete(BookingRollup))
+        watermark_value = None
+    bookings = all_bookings()
+    if watermark_value is None:
+        earliest = db.session.scalar(db.select(db.func.min(bookings.c.start_time)))
+    else:
+        watermark = EPOCH + timedelta(seconds=watermark_value.value)
+        changed_since = db.session.scalar(
+            db.select(db.func.min(Booking.start_time)).where(
+                (Booking.start_time >= watermark) | (Booking.end_time >= watermark)
+            )
+        )
+        earliest = min(watermark, changed_since) if changed_since else watermark
+    if earliest is None:
+        return 0
+    window_start = bucket_start(earliest, "month", offset)
+
+    rows = db.session.execute(
+        db.select(bookings.c.facility_id, bookings.c.start_time, bookings.c.end_time, bookings.c.cost_charged)
+        .where(bookings.c.facility_id.is_not(None))
+        .where((bookings.c.end_time.is_(None)) | (bookings.c.end_time >= window_start))
+    ).all()
+
+    intervals = defaultdict(list)
+    totals = defaultdict(lambda: {"revenue": 0.0, "booking_count": 0, "total_duration": 0.0, "peak_occupancy": 0})
+    for fac_id, start, end, cost in rows:
+        intervals[fac_id].append((start, end))
+        if end is None or start < window_start:
+            continue
+        for granularity in GRANULARITIES:
+            bucket = totals[(fac_id, granularity, bucket_start(start, granularity, offset))]
+            bucket["revenue"] += cost or 0.0
+            bucket["booking_count"] += 1
+            bucket["total_duration"] += (end - start).total_seconds()
+    for fac_id, fac_intervals in intervals.items():
+        for granularity in GRANULARITIES:
+            for bucket, peak in _peak_occupancy(fac_intervals, granularity, window_start, now, offset).items():
+                if bucket >= window_start and peak:
+                    totals[(fac_id, granularity, bucket)]["peak_occupancy"] = peak
+
+    db.session.execute(db.delete(BookingRollup).where(BookingRollup.bucket_start >= window_start))
+    if totals:
+        db.session.execute(db.insert(BookingRollup), [
+            {"facility_id": fac_id, "granularity": granularity, "bucket_start": bucket, **values}
+            for (fac_id, granularity, bucket), values in totals.items()
+        ])
+    db.session.merge(DashboardCounter(name=WATERMARK_COUNTER, value=(now - EPOCH).total_seconds()))
+    db.session.merge(DashboardCounter(name=OFFSET_COUNTER, value=offset_minutes))
+    db.session.commit()
+    return len(totals)
+
+
+def _to_utc(moment, offset):
+    """A datetime with an offset, or a naive local one, as naive UTC."""
+    if moment.tzinfo is not None:
+        return moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment - offset
+
+
+def query_rollups(granularity, start=None, end=None, facility_id=None):
+    """
+    Rollup rows with bucket starts in [start, end). Naive start and end
+    are local times; bucket_start is returned as local time with its
+    UTC offset, e.g. "2026-10-18T00:00:00+05:30".
+    """
+    offset = _utc_offset()
+    local = timezone(offset)
+    query = db.select(BookingRollup).where(BookingRollup.granularity == granularity)
+    if start:
+        query = query.where(BookingRollup.bucket_start >= _to_utc(start, offset))
+    if end:
+        query = query.where(BookingRollup.bucket_start < _to_utc(end, offset))
+    if facility_id is not None:
+        query = query.where(BookingRollup.facility_id == facility_id)
+    query = query.order_by(BookingRollup.bucket_start, BookingRollup.facility_id)
+    return [{
+        "facility_id": r.facility_id,
+        "bucket_start": (r.bucket_start + offset).replace(tzinfo=local).isoformat(),
+        "revenue": round(r.revenue, 2),
+        "booking_count": r.booking_count,
+        "avg_duration_minutes": round(r.total_duration / r.booking_count / 60, 1) if r.booking_count else 0,
+        "peak_occupancy": r.peak_occupancy
+    } for r in db.session.scalars(query)]
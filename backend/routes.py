@@ -1,34 +1,57 @@
 from .database import db
 from .models import Account, PermissionGroup, Slot, Facility, Booking
-from flask import current_app as app, jsonify, request, render_template, send_from_directory, redirect
+from flask import Blueprint, current_app, jsonify, request, render_template, send_from_directory, Response, redirect
 from flask_security import auth_required, roles_required, roles_accepted, current_user, login_user
-from werkzeug.security import check_password_hash, generate_password_hash
-from backend.tasks import download_reservations_csv, monthly_reservation_report
+from .passwords import password_hasher, HasherBusy
+from .signals import slot_state_changed
+from .allocation import reserve_free_slot, release_booked_slot
+from .dashboard import record_user_created, occupancy_stats, revenue_per_facility
+from .exports import parse_cursor, export_dir
+from .cache import get_history_version
+from .archive import booking_selects, archived_account_totals
+from .events import event_broker
+from .celery_init import get_celery
 from datetime import datetime, timedelta
-from math import ceil
-from celery.result import AsyncResult
 import os
+import secrets
+import logging
+
+logger = logging.getLogger(__name__)
+
+routes = Blueprint("routes", __name__)
 
 
 # ---------------- ROOT ---------------- #
-@app.route("/", methods=["GET"])
+@routes.route("/", methods=["GET"])
 def root_page():
     return render_template("index.html")
 
 
 # ---------------- AUTH ---------------- #
-@app.route("/auth/login", methods=["POST"])
+def _hasher_busy():
+    response = jsonify({"message": "Server is busy, please try again shortly"})
+    response.headers["Retry-After"] = "1"
+    return response, 503
+
+
+@routes.route("/auth/login", methods=["POST"])
 def login_action():
     info = request.get_json() or {}
     email = info.get("email")
     password = info.get("password")
     if not email:
         return jsonify({"message": "Email is required!"}), 400
-    user = app.security.datastore.find_user(mail=email)
+    user = current_app.security.datastore.find_user(mail=email)
     if not user:
         return jsonify({"message": "Account not found"}), 404
-    if not check_password_hash(user.password_hash, password):
-        return jsonify({"message": "Incorrect password"}), 400
+    try:
+        if not password_hasher.verify(user.password_hash, password):
+            return jsonify({"message": "Incorrect password"}), 400
+        if password_hasher.needs_rehash(user.password_hash):
+            user.password_hash = password_hasher.hash(password)
+            db.session.commit()
+    except HasherBusy:
+        return _hasher_busy()
 
     login_user(user)
     return jsonify({
@@ -39,43 +62,55 @@ def login_action():
     })
 
 
-@app.route("/auth/register", methods=["POST"])
+@routes.route("/auth/register", methods=["POST"])
 def register_action():
     details = request.get_json() or {}
-    if app.security.datastore.find_user(mail=details.get("email")):
+    if current_app.security.datastore.find_user(mail=details.get("email")):
         return jsonify({"message": "Account already exists", "success": False}), 400
-    app.security.datastore.create_user(
+    try:
+        password_hash = password_hasher.hash(details.get("password"))
+    except HasherBusy:
+        return _hasher_busy()
+    current_app.security.datastore.create_user(
         mail=details.get("email"),
         display_name=details.get("username"),
-        password_hash=generate_password_hash(details.get("password")),
+        password_hash=password_hash,
         roles=["user"]
     )
+    record_user_created()
     db.session.commit()
     return jsonify({"message": "Account created", "success": True}), 201
 
 
 # ---------------- PROFILE / ADMIN HOMES ---------------- #
-@app.route("/admin/home")
+@routes.route("/admin/home")
 @auth_required("token")
 @roles_required("admin")
 def admin_dashboard_info():
     return jsonify({"message": "Admin access confirmed"}), 200
 
 
-@app.route("/user/profile")
+@routes.route("/user/profile")
 @auth_required("token")
 @roles_accepted("user", "admin")
 def profile_info():
     acc = current_user
+    count, spent = db.session.execute(
+        db.select(db.func.count(Booking.booking_id), db.func.sum(Booking.cost_charged))
+        .where(Booking.account_id == acc.account_id)
+    ).one()
+    archived_count, archived_spent = archived_account_totals(acc.account_id)
     return jsonify({
         "username": acc.display_name,
         "email": acc.mail,
-        "roles": [r.name for r in acc.roles]
+        "roles": [r.name for r in acc.roles],
+        "total_bookings": count + archived_count,
+        "total_spent": round((spent or 0.0) + archived_spent, 2)
     }), 200
 
 
 # ---------------- BOOKING ---------------- #
-@app.route("/booking/reserve", methods=["POST"])
+@routes.route("/booking/reserve", methods=["POST"])
 @auth_required("token")
 @roles_accepted("user", "admin")
 def reserve_slot():
@@ -85,62 +120,86 @@ def reserve_slot():
         reg_no = data.get("vehicle_no")
         if not facility_id or not reg_no:
             return jsonify({"message": "facility_id and vehicle_no are required"}), 400
-        slot = Slot.query.filter_by(facility_id=facility_id, slot_state="A").first()
-        if not slot:
+        try:
+            facility_id = int(facility_id)
+        except (TypeError, ValueError):
+            return jsonify({"message": "Invalid facility_id"}), 400
+        booking = reserve_free_slot(facility_id, current_user.account_id, reg_no)
+        if not booking:
             return jsonify({"message": "No free slots available"}), 400
-        slot.slot_state = "O"
-        slot.assigned_user = current_user.account_id
-        slot.reg_number = reg_no
-        db.session.commit()
-        booking = Booking(
-            account_id=current_user.account_id,
-            slot_id=slot.slot_id,
-            reg_number_snapshot=reg_no,
-            facility_snapshot=slot.facility_ref.place_label,
-            slot_snapshot=slot.slot_label,
-            start_time=datetime.utcnow()
-        )
-        db.session.add(booking)
-        db.session.commit()
-        app.cache.delete("facility_data_listing")
+        slot_state_changed.send(current_app._get_current_object(), facility_id=facility_id, slot_id=booking.slot_id,
+                                state="O", account_id=current_user.account_id, position=booking.slot_ref.position)
         return jsonify({"message": "Slot reserved successfully!"}), 200
-    except Exception as e:
-        print(f"Reserve Slot Error: {e}")
+    except Exception:
+        logger.exception("Reserve Slot Error")
         return jsonify({"message": "Booking failed due to a server error."}), 500
 
 
 # ------------------ HISTORY ------------------ #
 
-@app.route("/booking/history")
+@routes.route("/booking/history")
 @auth_required("token")
 @roles_accepted("user", "admin")
 def history_view():
+    """
+    Return the user's bookings, newest first. ?limit=N pages the result
+    by booking_id (continue with ?before=<last id>), ?active=1 returns only
+    open bookings. Responses carry an ETag so unchanged polls get a 304.
+    """
     try:
-        records = Booking.query.filter_by(account_id=current_user.account_id).order_by(Booking.booking_id.desc()).all()
+        args = request.args
+        limit = args.get("limit", type=int)
+        before = args.get("before", type=int)
+        active_only = args.get("active", "").lower() in ("1", "true", "yes")
+        etag = f"{current_user.account_id}-{get_history_version(current_user.account_id)}-{limit}-{before}-{int(active_only)}"
+        if request.if_none_match.contains(etag):
+            response = current_app.response_class(status=304)
+            response.set_etag(etag)
+            return response
+
+        # Page the live and archived halves separately, each along its
+        # (account_id, booking_id) index, and merge the two pages here.
+        hot, cold = booking_selects()
+        rows = []
+        for source in (hot, cold) if not active_only else (hot,):
+            cols = source.selected_columns
+            query = source.add_columns(Facility.place_label, Facility.hourly_rate)\
+                .outerjoin(Facility, Facility.facility_id == cols.facility_id)\
+                .where(cols.account_id == current_user.account_id).order_by(cols.booking_id.desc())
+            if active_only:
+                query = query.where(cols.end_time.is_(None))
+            if before:
+                query = query.where(cols.booking_id < before)
+            if limit:
+                query = query.limit(limit)
+            rows.extend(db.session.execute(query))
+        rows.sort(key=lambda b: b.booking_id, reverse=True)
+
         result = []
-        for b in records:
-            associated_slot = b.slot_ref
-            facility = associated_slot.facility_ref if associated_slot else None
+        for b in rows[:limit] if limit else rows:
             result.append({
                 "id": b.booking_id, 
                 "slot_id_to_release": b.slot_id,
-                "facility": facility.place_label if facility else b.facility_snapshot,
-                "slot": associated_slot.slot_label if associated_slot else b.slot_snapshot,
+                "facility": b.place_label if b.place_label else b.facility_snapshot,
+                "slot": b.slot_label if b.slot_label else b.slot_snapshot,
                 "vehicle": b.reg_number_snapshot, 
                 "start": (b.start_time + timedelta(hours=5, minutes=30)).isoformat(), 
                 "end": (b.end_time + timedelta(hours=5, minutes=30)).isoformat() if b.end_time else None, 
                 "released": bool(b.end_time),
-                "rate": facility.hourly_rate if facility else "N/A"
+                "rate": b.hourly_rate if b.place_label else "N/A"
             })
-        return jsonify(result), 200
-    except Exception as e:
-        print(f"History View Error: {e}")
+        response = jsonify(result)
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = "private, no-cache"
+        return response, 200
+    except Exception:
+        logger.exception("History View Error")
         return jsonify({"message": "Error retrieving history."}), 500
 
 
 
 # ------------------ RELEASE ------------------ #
-@app.route("/booking/release", methods=["POST"])
+@routes.route("/booking/release", methods=["POST"])
 @auth_required("token")
 @roles_accepted("user", "admin")
 def release_action():
@@ -150,122 +209,181 @@ def release_action():
         slot = Slot.query.get(slot_pk_id)
         if not slot:
             return jsonify({"message": "Invalid slot ID"}), 404
-        booking = Booking.query.filter_by(slot_id=slot.slot_id, account_id=current_user.account_id, end_time=None)\
-            .order_by(Booking.booking_id.desc()).first()
+        booking = release_booked_slot(slot, current_user.account_id)
         if not booking:
             return jsonify({"message": "No active booking found for this spot/user"}), 400
-        booking.end_time = datetime.utcnow()
-        hours_used = ceil((booking.end_time - booking.start_time).total_seconds() / 3600)
-        booking.cost_charged = round(max(hours_used, 1) * slot.facility_ref.hourly_rate, 2)
-        slot.slot_state = "A"
-        slot.assigned_user = None
-        slot.reg_number = None
-        db.session.commit()
-        app.cache.delete("facility_data_listing")
+        slot_state_changed.send(current_app._get_current_object(), facility_id=slot.facility_id, slot_id=slot.slot_id,
+                                state="A", account_id=current_user.account_id, position=slot.position)
         return jsonify({"message": f"Spot released. Charged ₹{booking.cost_charged}"}), 200
-    except Exception as e:
-        print(f"Release Action Error: {e}")
+    except Exception:
+        logger.exception("Release Action Error")
         return jsonify({"message": "Error processing release."}), 500
 
 
+# ---------------- LIVE EVENTS (SSE) ---------------- #
+STREAM_TICKET_KEY = "events:ticket:{}"
+STREAM_TICKET_TTL = 30
+
+
+@routes.route("/events/ticket", methods=["POST"])
+@auth_required("token")
+@roles_accepted("user", "admin")
+def event_stream_ticket():
+    """
+    Issue a single-use ticket for /events/stream. EventSource cannot set
+    headers, and the auth token must not end up in URLs and access logs,
+    so the stream is opened with ?ticket= instead.
+    """
+    ticket = secrets.token_urlsafe(32)
+    current_app.cache.set(STREAM_TICKET_KEY.format(ticket), {
+        "account_id": current_user.account_id,
+        "include_tasks": current_user.has_role("admin"),
+    }, timeout=STREAM_TICKET_TTL)
+    return jsonify({"ticket": ticket, "expires_in": STREAM_TICKET_TTL}), 201
+
+
+def _redeem_stream_ticket(ticket):
+    """Return the ticket's grant, or None if unknown, expired or already used."""
+    if not ticket:
+        return None
+    key = STREAM_TICKET_KEY.format(ticket)
+    grant = current_app.cache.get(key)
+    # Only the request whose delete removes the key gets to use it.
+    if grant is None or not current_app.cache.delete(key):
+        return None
+    account = db.session.get(Account, grant["account_id"])
+    return grant if account is not None and account.active else None
+
+
+@routes.route("/events/stream")
+def event_stream():
+    """
+    Server-Sent Events: slot deltas, facility edits and (for admins)
+    export task progress. Opened with a ticket from /events/ticket.
+    """
+    grant = _redeem_stream_ticket(request.args.get("ticket"))
+    if grant is None:
+        return jsonify({"message": "Invalid or expired stream ticket"}), 401
+    subscription = event_broker.subscribe(include_tasks=grant["include_tasks"])
+    response = Response(event_broker.stream(subscription), mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+
 # ---------------- ADMIN REPORTS ---------------- #
-@app.route("/admin/export-csv")
+@routes.route("/admin/export-csv")
+@routes.route("/api/export")
 @auth_required("token")
 @roles_required("admin")
 def queue_csv_export():
-    task = download_reservations_csv.delay()
+    args = request.args
+    compress = args.get("compress", "").lower() in ("1", "true", "yes")
+    since = args.get("since") or None
+    try:
+        for day in (args.get("start"), args.get("end")):
+            if day:
+                datetime.fromisoformat(day)
+        if since and since != "last":
+            parse_cursor(since)
+        facility_id = int(args["facility_id"]) if args.get("facility_id") else None
+    except ValueError:
+        return jsonify({"message": "Invalid export filter"}), 400
+    # Celery and the task module load on the first request that queues a task.
+    get_celery(current_app)
+    from .tasks import download_reservations_csv
+    task = download_reservations_csv.delay(
+        compress=compress, start=args.get("start"), end=args.get("end"),
+        facility_id=facility_id, since=since
+    )
     return jsonify({"job_id": task.id}), 202
 
 
-@app.route("/admin/export-result/<job_id>")
+@routes.route("/admin/export-result/<job_id>")
+@routes.route("/api/csv_result/<job_id>")
 @auth_required("token")
 @roles_required("admin")
 def csv_result(job_id):
-    result = AsyncResult(job_id)
+    result = get_celery(current_app).AsyncResult(job_id)
+    if result.state == "PROGRESS":
+        info = result.info or {}
+        total = info.get("total") or 0
+        percent = round(100 * info.get("done", 0) / total) if total else 0
+        return jsonify({"status": "processing", "message": "File is being generated", "percent": percent}), 202
     if not result.ready():
         return jsonify({"status": "processing", "message": "File is being generated"}), 202
     if result.failed():
         return jsonify({"status": "failed", "message": "Task failed"}), 500
-    filename = result.result
+    output = result.result or {}
+    filename = output.get("filename") if isinstance(output, dict) else output
     if not filename:
         return jsonify({"status": "error", "message": "No file produced"}), 500
+    if not os.path.isfile(os.path.join(export_dir(), os.path.basename(filename))):
+        return jsonify({"status": "expired", "message": "Export has expired, please export again"}), 410
     try:
-        return send_from_directory("static", filename, as_attachment=True)
+        response = send_from_directory(export_dir(), os.path.basename(filename), as_attachment=True)
+        if isinstance(output, dict):
+            response.headers["X-Export-Cursor"] = output.get("cursor", "")
+        return response
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 500
 
 
-@app.route("/admin/send-monthly-report")
+@routes.route("/admin/send-monthly-report")
 @auth_required("token")
 @roles_required("admin")
 def trigger_monthly_report():
+    get_celery(current_app)
+    from .tasks import monthly_reservation_report
     task = monthly_reservation_report.delay()
     return jsonify({"status": "queued", "task": task.id}), 202
 
 
 # 1. Facility Occupancy Stats
-@app.route('/api/admin/lot-stats')
+@routes.route('/api/admin/lot-stats')
 @auth_required('token')
 @roles_required('admin')
 def get_lot_occupancy_stats():
     try:
-        facilities = Facility.query.all()
-        result = []
-        for fac in facilities:
-            occupied = Slot.query.filter_by(facility_id=fac.facility_id, slot_state='O').count()
-            available = Slot.query.filter_by(facility_id=fac.facility_id, slot_state='A').count()
-            result.append({
-                "location_name": fac.place_label,
-                "occupied_spots": occupied,
-                "available_spots": available
-            })
-        return jsonify(result), 200
-    except Exception as e:
-        print(f"Occupancy Stats Error: {e}")
+        return jsonify(occupancy_stats()), 200
+    except Exception:
+        logger.exception("Occupancy Stats Error")
         return jsonify({"error": "Failed to fetch occupancy stats"}), 500
 
 
 # 2. Revenue per Facility
-@app.route('/api/admin/revenue-per-lot')
+@routes.route('/api/admin/revenue-per-lot')
 @auth_required('token')
 @roles_required('admin')
 def get_revenue_per_lot():
     try:
-        rows = db.session.query(
-            Facility.place_label,
-            db.func.sum(Booking.cost_charged)
-        ).join(Slot, Slot.facility_id == Facility.facility_id
-        ).join(Booking, Booking.slot_id == Slot.slot_id
-        ).group_by(Facility.facility_id).all()
-        data = [{"location_name": r[0], "revenue": round(r[1] or 0, 2)} for r in rows]
-        return jsonify(data), 200
-    except Exception as e:
-        print(f"Revenue Stats Error: {e}")
+        return jsonify(revenue_per_facility()), 200
+    except Exception:
+        logger.exception("Revenue Stats Error")
         return jsonify({"error": "Failed to fetch revenue stats"}), 500
 
 
-# ---------------- FRONTEND BRIDGE ROUTES ---------------- #
-
-@app.route("/api/lot", methods=["GET", "POST"])
-def bridge_lot_root():
-    return redirect("/catalog/facility", code=307)
-
-@app.route("/api/lot/<int:facility_id>", methods=["PUT", "DELETE"])
-def bridge_lot_edit(facility_id):
-    return redirect(f"/catalog/facility/{facility_id}", code=307)
-
-@app.route("/api/spot/<int:facility_id>/<int:position>", methods=["GET", "DELETE"])
-def bridge_spot(facility_id, position):
-    return redirect(f"/catalog/slot/{facility_id}/{position}", code=307)
-
-@app.route("/api/users", methods=["GET"])
-def bridge_users():
-    return redirect("/admin/accounts", code=307)
-
-@app.route("/api/export", methods=["GET"])
-def bridge_export():
-    return redirect("/admin/export-csv", code=307)
-
-@app.route("/api/csv_result/<job_id>", methods=["GET"])
-def bridge_csv_result(job_id):
-    return redirect(f"/admin/export-result/{job_id}", code=307)
+# ---------------- FRONTEND REDIRECT BRIDGE ---------------- #
+# The /api/* paths the frontend calls used to answer with a 307 to the
+# canonical path; they are now served directly. API_REDIRECT_BRIDGE brings
+# the redirect back, e.g. to measure the extra round-trip.
+
+BRIDGED_PATHS = (
+    ("/api/lot", "/catalog/facility"),
+    ("/api/spot", "/catalog/slot"),
+    ("/api/users", "/admin/accounts"),
+    ("/api/export", "/admin/export-csv"),
+    ("/api/csv_result", "/admin/export-result"),
+)
+
+
+@routes.before_app_request
+def redirect_bridge():
+    if not current_app.config.get("API_REDIRECT_BRIDGE"):
+        return None
+    for legacy, canonical in BRIDGED_PATHS:
+        if request.path == legacy or request.path.startswith(legacy + "/"):
+            target = canonical + request.path[len(legacy):]
+            query = request.query_string.decode()
+            return redirect(f"{target}?{query}" if query else target, code=307)
+    return None
@@ -0,0 +1,159 @@
+import random
+import uuid
+from datetime import datetime, timedelta
+from math import ceil
+from flask import current_app
+from .database import db
+from .models import Account, AccountGroupLink, PermissionGroup, Facility, Slot, Booking, DashboardCounter
+from .provisioning import provision_slots
+from .dashboard import reconcile_metrics
+from .rollups import refresh_rollups, WATERMARK_COUNTER
+from .signals import facility_changed
+from .passwords import password_hasher
+
+SEED_PASSWORD = "password"
+SEED_EMAIL = "user{}@seed.example"
+INSERT_CHUNK = 5000
+# Relative booking weight for each hour of the day: morning and evening peaks.
+HOURLY_WEIGHTS = (1, 1, 1, 1, 1, 2, 4, 8, 12, 10, 7, 6, 6, 6, 6, 7, 9, 11, 9, 6, 4, 3, 2, 1)
+
+
+def _insert_chunked(model, rows):
+    for i in range(0, len(rows), INSERT_CHUNK):
+        db.session.execute(db.insert(model), rows[i:i + INSERT_CHUNK])
+
+
+def _booking_start(rng, now, days):
+    day = now - timedelta(days=rng.randrange(days))
+    hour = rng.choices(range(24), weights=HOURLY_WEIGHTS)[0]
+    start = day.replace(hour=hour, minute=rng.randrange(60), second=rng.randrange(60), microsecond=0)
+    return min(start, now - timedelta(minutes=1))
+
+
+def seed_database(facilities=20, slots=4000, accounts=1000, bookings=50000, occupancy=0.3, days=90, seed=42):
+    """
+    Fill the database with synthetic data using bulk inserts and return
+    a summary dict. Slot counts per facility and facility popularity are
+    skewed, booking start times follow a daily morning/evening curve
+    over the last `days` days, and durations are log-normal (median
+    about two hours). A slot's bookings never overlap, so a busy slot's
+    later bookings can be pushed back or dropped. `occupancy` of the
+    slots get an open booking, after their last closed one. All
+    seeded accounts share the password "password". Derived state (slot
+    index, dashboard metrics, rollups, caches) is refreshed at the end.
+    """
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+
+    # Facilities, with slot counts drawn around slots / facilities.
+    first_facility = (db.session.scalar(db.select(db.func.max(Facility.facility_id))) or 0) + 1
+    weights = [rng.uniform(0.5, 1.5) for _ in range(facilities)]
+    sizes = [max(1, round(slots * w / sum(weights))) for w in weights]
+    fac_rows = [{
+        "place_label": f"Seed Facility {first_facility + i}",
+        "hourly_rate": float(rng.choice((10, 20, 25, 30, 40, 50, 75, 100))),
+        "zipcode": str(rng.randrange(110001, 110099)),
+        "total_slots": size,
+    } for i, size in enumerate(sizes)]
+    _insert_chunked(Facility, fac_rows)
+    facility_ids = db.session.scalars(
+        db.select(Facility.facility_id).where(Facility.facility_id >= first_facility).order_by(Facility.facility_id)
+    ).all()
+    for fac_id, size in zip(facility_ids, sizes):
+        provision_slots(fac_id, size)
+    labels = {fac_id: row["place_label"] for fac_id, row in zip(facility_ids, fac_rows)}
+    rates = {fac_id: row["hourly_rate"] for fac_id, row in zip(facility_ids, fac_rows)}
+    slots_by_facility = {fac_id: [] for fac_id in facility_ids}
+    for slot in db.session.execute(
+        db.select(Slot.slot_id, Slot.facility_id, Slot.slot_label)
+        .where(Slot.facility_id.in_(facility_ids)).order_by(Slot.slot_id)
+    ):
+        slots_by_facility[slot.facility_id].append(slot)
+
+    # Accounts, all in the "user" role, sharing one precomputed hash.
+    first_account = (db.session.scalar(db.select(db.func.max(Account.account_id))) or 0) + 1
+    password_hash = password_hasher.hash(SEED_PASSWORD)
+    _insert_chunked(Account, [{
+        "mail": SEED_EMAIL.format(first_account + i),
+        "display_name": f"Seed User {first_account + i}",
+        "password_hash": password_hash,
+        "fs_uniquifier": uuid.uuid4().hex,
+        "active": True,
+    } for i in range(accounts)])
+    account_ids = db.session.scalars(
+        db.select(Account.account_id).where(Account.account_id >= first_account).order_by(Account.account_id)
+    ).all()
+    user_role = db.session.scalar(db.select(PermissionGroup.group_id).where(PermissionGroup.name == "user"))
+    _insert_chunked(AccountGroupLink, [{"account_id": acc_id, "group_id": user_role} for acc_id in account_ids])
+
+    # Open bookings on a share of the slots, which are marked occupied.
+    all_slots = [slot for fac_slots in slots_by_facility.values() for slot in fac_slots]
+    occupied = rng.sample(all_slots, int(len(all_slots) * occupancy)) if account_ids else []
+    open_since = {slot.slot_id: now - timedelta(minutes=rng.randrange(1, 600)) for slot in occupied}
+
+    # Closed historical bookings; popular facilities (Zipf-like) get more.
+    # Each slot's bookings are laid end to end so they never overlap, and
+    # stop before the slot's open booking (or now).
+    popularity = [1 / (rank + 1) for rank in range(len(facility_ids))]
+    starts_by_slot = {}
+    picks = rng.choices(facility_ids, weights=popularity, k=bookings) if facility_ids and account_ids else []
+    for fac_id in picks:
+        slot = rng.choice(slots_by_facility[fac_id])
+        starts_by_slot.setdefault(slot, []).append(_booking_start(rng, now, days))
+    booking_rows = []
+    for slot, starts in starts_by_slot.items():
+        limit = open_since.get(slot.slot_id, now)
+        free_from = None
+        for start in sorted(starts):
+            if free_from is not None:
+                start = max(start, free_from)
+            if start >= limit:
+                break
+            end = min(start + timedelta(hours=rng.lognormvariate(0.7, 0.8)), limit)
+            free_from = end
+            hours = max(1, ceil((end - start).total_seconds() / 3600))
+            booking_rows.append({
+                "account_id": rng.choice(account_ids),
+                "slot_id": slot.slot_id,
+                "start_time": start,
+                "end_time": end,
+                "facility_snapshot": labels[slot.facility_id],
+                "slot_snapshot": slot.slot_label,
+                "cost_charged": hours * rates[slot.facility_id],
+                "reg_number_snapshot": f"SEED{rng.randrange(10000):04d}",
+            })
+
+    slot_updates = []
+    for slot in occupied:
+        account_id = rng.choice(account_ids)
+        reg_number = f"SEED{rng.randrange(10000):04d}"
+        slot_updates.append({"slot_id": slot.slot_id, "slot_state": "O", "assigned_user": account_id,
+                             "reg_number": reg_number})
+        booking_rows.append({
+            "account_id": account_id,
+            "slot_id": slot.slot_id,
+            "start_time": open_since[slot.slot_id],
+            "end_time": None,
+            "facility_snapshot": labels[slot.facility_id],
+            "slot_snapshot": slot.slot_label,
+            "cost_charged": 0.0,
+            "reg_number_snapshot": reg_number,
+        })
+    if slot_updates:
+        db.session.execute(db.update(Slot), slot_updates)
+    booking_rows.sort(key=lambda row: row["start_time"])
+    _insert_chunked(Booking, booking_rows)
+
+    db.session.execute(db.delete(DashboardCounter).where(DashboardCounter.name == WATERMARK_COUNTER))
+    db.session.commit()
+    reconcile_metrics()
+    refresh_rollups(now)
+    for fac_id in facility_ids:
+        facility_changed.send(current_app._get_current_object(), facility_id=fac_id, action="created")
+    return {
+        "facilities": len(facility_ids),
+        "slots": len(all_slots),
+        "accounts": len(account_ids),
+        "bookings": len(booking_rows),
+        "open_bookings": len(slot_updates),
+    }
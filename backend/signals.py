@@ -0,0 +1,15 @@
+from blinker import Namespace
+
+_signals = Namespace()
+
+# Sent with facility_id, slot_id, the new state, the booking's account_id
+# and the slot's position whenever a slot is reserved or released.
+slot_state_changed = _signals.signal("slot-state-changed")
+
+# Sent with facility_id and action ("created", "updated" or "deleted") when
+# a facility or its slot layout is edited.
+facility_changed = _signals.signal("facility-changed")
+
+# Sent with the account_ids whose closed bookings were just moved to the
+# archive table.
+bookings_archived = _signals.signal("bookings-archived")
@@ -0,0 +1,125 @@
+import heapq
+import threading
+from .database import db
+from .models import Facility, Slot
+from .signals import slot_state_changed, facility_changed
+
+
+class FreeSlotIndex:
+    """
+    In-process index of free slots per facility: a set of free slot ids
+    for O(1) membership, and a min-heap over them for the lowest free
+    slot. Occupied slots leave the heap lazily, when they reach the top,
+    so marking a slot is O(1) and picking one is amortised O(log n).
+
+    The index is loaded from the slots table on first use and kept
+    current by the slot_state_changed and facility_changed signals of
+    this process only; each worker process has its own copy and another
+    worker's changes reach it only through a facility resync. It is
+    therefore a hint: allocation still claims slots with a conditional
+    UPDATE and discards a candidate that turns out to be taken.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._free = {}
+        self._heap = {}
+        self._loaded = False
+
+    def rebuild(self):
+        """Reload every facility from the slots table."""
+        free = {fac_id: set() for (fac_id,) in db.session.execute(db.select(Facility.facility_id))}
+        rows = db.session.execute(db.select(Slot.facility_id, Slot.slot_id).where(Slot.slot_state == "A"))
+        for fac_id, slot_id in rows:
+            free.setdefault(fac_id, set()).add(slot_id)
+        heaps = {fac_id: sorted(ids) for fac_id, ids in free.items()}
+        with self._lock:
+            self._free, self._heap, self._loaded = free, heaps, True
+
+    def resync(self, facility_id):
+        """Reload a single facility, or forget it if it no longer exists."""
+        if db.session.get(Facility, facility_id) is None:
+            self.drop(facility_id)
+            return
+        free = set(db.session.scalars(
+            db.select(Slot.slot_id).where(Slot.facility_id == facility_id, Slot.slot_state == "A")
+        ))
+        with self._lock:
+            self._free[facility_id] = free
+            self._heap[facility_id] = sorted(free)
+
+    def drop(self, facility_id):
+        with self._lock:
+            self._free.pop(facility_id, None)
+            self._heap.pop(facility_id, None)
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            self.rebuild()
+
+    def free_slot(self, facility_id):
+        """Return the lowest free slot id of a facility, or None if it is full."""
+        self._ensure_loaded()
+        with self._lock:
+            free, heap = self._free.get(facility_id), self._heap.get(facility_id)
+            if not free:
+                if heap:
+                    heap.clear()
+                return None
+            while heap[0] not in free:
+                heapq.heappop(heap)
+            return heap[0]
+
+    def mark(self, facility_id, slot_id, state):
+        """Record a slot state change that has been committed to the DB."""
+        self._ensure_loaded()
+        with self._lock:
+            free = self._free.get(facility_id)
+            if free is None:
+                return
+            if state == "A" and slot_id not in free:
+                free.add(slot_id)
+                heap = self._heap[facility_id]
+                if len(heap) > 2 * len(free) + 64:
+                    # Too many occupied ids left behind; start over.
+                    heap[:] = sorted(free)
+                else:
+                    heapq.heappush(heap, slot_id)
+            elif state != "A":
+                free.discard(slot_id)
+
+    def discard(self, facility_id, slot_id):
+        """Forget a free slot id that a claim found already taken or gone."""
+        with self._lock:
+            free = self._free.get(facility_id)
+            if free:
+                free.discard(slot_id)
+
+    def mismatches(self):
+        """
+        Compare the index with the DB, reload it, and return the facility
+        ids whose indexed state had drifted.
+        """
+        self._ensure_loaded()
+        with self._lock:
+            free = {fac_id: set(ids) for fac_id, ids in self._free.items()}
+        self.rebuild()
+        with self._lock:
+            bad = [fac_id for fac_id in set(free) | set(self._free) if free.get(fac_id) != self._free.get(fac_id)]
+        return sorted(bad)
+
+
+slot_index = FreeSlotIndex()
+
+
+@slot_state_changed.connect
+def _on_slot_state_changed(sender, facility_id, slot_id, state, **extra):
+    slot_index.mark(facility_id, slot_id, state)
+
+
+@facility_changed.connect
+def _on_facility_changed(sender, facility_id, action, **extra):
+    if action == "deleted":
+        slot_index.drop(facility_id)
+    else:
+        slot_index.resync(facility_id)
@@ -1,77 +1,239 @@
-from celery import shared_task
+from celery import shared_task, group
+from flask import current_app
+from .database import db
 from .models import Account, Booking, PermissionGroup 
+from .exports import write_export
+from .dashboard import reconcile_metrics
+from .rollups import refresh_rollups
+from .archive import all_bookings, archive_closed_bookings
 from .utils import format_report
-from .mail import send_email
+from .mail import send_bulk_email, MailBatchInterrupted
+from .events import event_broker
+from .instrumentation import record_task_rows, record_mail_failures
+from itertools import groupby
 import datetime
-import csv
-
-
-@shared_task(ignore_results=False, name="download_reservations_csv")
-def download_reservations_csv():
-    booking_records = Booking.query.all() 
-    filename = f"booking_records_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-    filepath = f'static/{filename}'
-    with open(filepath, 'w', newline='') as csvfile:
-        writer = csv.writer(csvfile)
-        writer.writerow([
-            "Username", "Email", "Facility Name", "Vehicle Number",
-            "Slot Label", "Entry Time", "Exit Time", "Cost"
-        ])
-        for record in booking_records:
-            patron = record.account_owner if record.account_owner else None
-            writer.writerow([
-                patron.display_name if patron else "N/A",
-                patron.mail if patron else "N/A",
-                record.facility_snapshot,
-                record.reg_number_snapshot,
-                record.slot_snapshot,
-                record.start_time.strftime('%d-%m-%Y %I:%M %p'),
-                record.end_time.strftime('%d-%m-%Y %I:%M %p') if record.end_time else "Not Released",
-                record.cost_charged if record.cost_charged else "Pending"
-            ])
-    return filename
 
 
-@shared_task(ignore_results=False, name="monthly_reservation_report")
-def monthly_reservation_report():
-    users_to_report = [u for u in Account.query.all() if "admin" not in [r.name for r in u.roles]]
-    
-    for user_account in users_to_report:
+@shared_task(bind=True, ignore_results=False, name="download_reservations_csv")
+def download_reservations_csv(self, compress=False, start=None, end=None, facility_id=None, since=None):
+    exported = {"rows": 0}
+
+    def report_progress(done, total):
+        exported["rows"] = done
+        if self.request.id:
+            self.update_state(state="PROGRESS", meta={"done": done, "total": total})
+            percent = round(100 * done / total) if total else 0
+            event_broker.publish("task", {"job_id": self.request.id, "state": "PROGRESS", "percent": percent})
+
+    # One cursor per filter set: "since last" means since the last export of the same rows.
+    cursor_key = f"export:last_cursor:{facility_id or 'all'}:{start or ''}:{end or ''}"
+    if since == "last":
+        since = current_app.cache.get(cursor_key)
+    try:
+        filename, cursor = write_export(
+            compress=compress, progress=report_progress,
+            start=start, end=end, facility_id=facility_id, since=since
+        )
+    except Exception:
+        event_broker.publish("task", {"job_id": self.request.id, "state": "FAILURE"})
+        raise
+    current_app.cache.set(cursor_key, cursor, timeout=0)
+    record_task_rows(exported["rows"])
+    event_broker.publish("task", {"job_id": self.request.id, "state": "SUCCESS"})
+    return {"filename": filename, "cursor": cursor}
+
+
+MAIL_CHUNK_SIZE = 200
+MAIL_MAX_RETRIES = 5
+MAIL_RESUME_KEY = "mail_batch:resume:{}"
+MAIL_RESUME_TTL = 24 * 60 * 60
+
+
+def _chunked(items, size=MAIL_CHUNK_SIZE):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _fan_out_emails(emails):
+    """
+    Split emails (any iterable, consumed lazily) into chunks and queue
+    each chunk as a send_email_batch subtask as soon as it fills, so
+    workers send in parallel and only one chunk is held here at a time.
+    Returns the number of subtasks queued.
+    """
+    queued = 0
+    for chunk in _chunked(emails):
+        send_email_batch.delay(chunk)
+        queued += 1
+    return queued
+
+
+def _send_resumable(task_id, emails):
+    """
+    send_bulk_email for a task that may be retried: the number of
+    messages already handled is kept in the cache under the task id,
+    so a retry after a dropped connection does not resend them.
+    """
+    cache = current_app.cache
+    resume_key = MAIL_RESUME_KEY.format(task_id)
+    start = (cache.get(resume_key) or 0) if task_id else 0
+    try:
+        sent, failed = send_bulk_email(emails[start:])
+    except MailBatchInterrupted as e:
+        if task_id:
+            cache.set(resume_key, start + e.processed, timeout=MAIL_RESUME_TTL)
+        raise
+    if start:
+        cache.delete(resume_key)
+    record_mail_failures(failed)
+    return sent, failed
+
+
+@shared_task(bind=True, ignore_results=True, name="send_email_batch",
+             autoretry_for=(MailBatchInterrupted,), retry_backoff=True, max_retries=MAIL_MAX_RETRIES)
+def send_email_batch(self, emails):
+    sent, failed = _send_resumable(self.request.id, emails)
+    record_task_rows(sent)
+    return {"sent": sent, "failed": failed}
+
+
+def _keyset_pages(query, key_column, page_size):
+    """
+    Yield pages of rows from query, ordered and paged by key_column so
+    only one page is held in memory at a time.
+    """
+    query = query.order_by(key_column)
+    last_key = None
+    while True:
+        page_query = query if last_key is None else query.where(key_column > last_key)
+        page = db.session.execute(page_query.limit(page_size)).all()
+        if not page:
+            return
+        yield page
+        last_key = getattr(page[-1], key_column.key)
+
+
+def _month_bounds(year, month):
+    start = datetime.datetime(year, month, 1)
+    end = datetime.datetime(year + month // 12, month % 12 + 1, 1)
+    return start, end
+
+
+@shared_task(bind=True, ignore_results=True, name="send_monthly_report_batch",
+             autoretry_for=(MailBatchInterrupted,), retry_backoff=True, max_retries=MAIL_MAX_RETRIES)
+def send_monthly_report_batch(self, account_ids, year, month):
+    """
+    Render and send the monthly report for a chunk of accounts, loading
+    their bookings for the month in one query.
+    """
+    month_start, month_end = _month_bounds(year, month)
+    accounts = db.session.execute(
+        db.select(Account.account_id, Account.display_name, Account.mail)
+        .where(Account.account_id.in_(account_ids)).order_by(Account.account_id)
+    ).all()
+    records = all_bookings()
+    bookings = db.session.execute(
+        db.select(
+            records.c.account_id, records.c.facility_snapshot, records.c.reg_number_snapshot,
+            records.c.slot_snapshot, records.c.start_time, records.c.end_time, records.c.cost_charged
+        ).where(
+            records.c.account_id.in_(account_ids),
+            records.c.start_time >= month_start,
+            records.c.start_time < month_end
+        ).order_by(records.c.account_id, records.c.booking_id)
+    ).all()
+    bookings_by_account = {
+        account_id: list(records)
+        for account_id, records in groupby(bookings, key=lambda record: record.account_id)
+    }
+
+    emails = []
+    for user_account in accounts:
         user_data = {
             "username": user_account.display_name,
-            "reservations": []
-        }
-        for record in user_account.bookings:
-            user_data["reservations"].append({
-                "facility": record.facility_snapshot,
+            "reservations": [{
+                "lot": record.facility_snapshot,
                 "vehicle": record.reg_number_snapshot,
-                "slot": record.slot_snapshot,
+                "spot": record.slot_snapshot,
                 "booked_at": record.start_time.strftime("%d-%m-%Y %I:%M %p"),
                 "released_at": record.end_time.strftime("%d-%m-%Y %I:%M %p") if record.end_time else "Not Released",
                 "cost": record.cost_charged if record.cost_charged else "Pending"
-            })
-        html_message = format_report("templates/mail_details.html", user_data)
-        send_email(
-            user_account.mail,
-            subject="Monthly Parking Report",
-            message=html_message,
-            content="html"
-        )
+            } for record in bookings_by_account.get(user_account.account_id, [])]
+        }
+        emails.append({
+            "to_address": user_account.mail,
+            "subject": "Monthly Parking Report",
+            "message": format_report("templates/mail_details.html", user_data),
+            "content": "html"
+        })
+    record_task_rows(len(bookings))
+    sent, failed = _send_resumable(self.request.id, emails)
+    return {"sent": sent, "failed": failed}
+
+
+@shared_task(ignore_results=False, name="monthly_reservation_report")
+def monthly_reservation_report(year=None, month=None):
+    """
+    Queue the monthly report for every non-admin account, defaulting to
+    the current month. Rendering and delivery happen in chunked
+    send_monthly_report_batch subtasks so workers share the load.
+    """
+    today = datetime.date.today()
+    year, month = year or today.year, month or today.month
+    query = db.select(Account.account_id).where(~Account.roles.any(PermissionGroup.name == "admin"))
+    batches = [
+        send_monthly_report_batch.s([row.account_id for row in page], year, month)
+        for page in _keyset_pages(query, Account.account_id, MAIL_CHUNK_SIZE)
+    ]
+    if batches:
+        group(batches).apply_async()
     return "Monthly reservation reports sent."
 
 
+REMINDER_INACTIVITY = datetime.timedelta(days=2)
+REMINDER_COOLDOWN = 24 * 60 * 60
+REMINDER_SENT_KEY = "reminder_sent:{}"
+REMINDER_PAGE_SIZE = 1000
+
+
+def _inactive_accounts(inactive_since, page_size=REMINDER_PAGE_SIZE):
+    """
+    Yield pages of (account_id, display_name, mail) for non-admin accounts
+    with no booking started since inactive_since, using NOT EXISTS
+    subqueries and keyset pagination on account_id. Only the hot table
+    is checked: archived bookings closed days before inactive_since.
+    """
+    recent_booking = db.select(Booking.booking_id).where(
+        Booking.account_id == Account.account_id,
+        Booking.start_time >= inactive_since
+    ).exists()
+    query = db.select(Account.account_id, Account.display_name, Account.mail).where(
+        ~Account.roles.any(PermissionGroup.name == "admin"),
+        ~recent_booking
+    )
+    return _keyset_pages(query, Account.account_id, page_size)
+
+
 @shared_task(ignore_results=True, name="daily_reminder")
 def daily_reminder():
-    now = datetime.datetime.utcnow()
-    inactive_since = now - datetime.timedelta(days=2)
-    users_to_remind = [u for u in Account.query.all() if "admin" not in [r.name for r in u.roles]]
-    for user_account in users_to_remind:
-        recent = Booking.query.filter(
-            Booking.account_id == user_account.account_id,
-            Booking.start_time >= inactive_since
-        ).first()
-        if not recent:
-            message = f"""Hi {user_account.display_name},
+    inactive_since = datetime.datetime.utcnow() - REMINDER_INACTIVITY
+    cache = current_app.cache
+    reminded = 0
+
+    def reminder_emails():
+        nonlocal reminded
+        for page in _inactive_accounts(inactive_since):
+            keys = [REMINDER_SENT_KEY.format(row.account_id) for row in page]
+            already_sent = cache.get_many(*keys)
+            due = [row for row, sent in zip(page, already_sent) if not sent]
+            for user_account in due:
+                message = f"""Hi {user_account.display_name},
 
 We noticed that you haven’t reserved a parking slot in the last couple of days.
 If you plan to visit the premises soon, don’t forget to book your preferred parking spot in advance to avoid last-minute hassle. It only takes a few seconds!
@@ -80,11 +242,36 @@ Login now and secure your spot at your convenience.
 Best regards,
 Vehicle Parking App Team
 """
-            send_email(
-                user_account.mail,
-                subject="Daily Parking Reminder",
-                message=message,
-                content="plain"
-            )
-
-    return "Simple daily reminders sent."
\ No newline at end of file
+                yield {
+                    "to_address": user_account.mail,
+                    "subject": "Daily Parking Reminder",
+                    "message": message,
+                    "content": "plain"
+                }
+            cache.set_many({REMINDER_SENT_KEY.format(row.account_id): True for row in due}, timeout=REMINDER_COOLDOWN)
+            reminded += len(due)
+
+    _fan_out_emails(reminder_emails())
+    record_task_rows(reminded)
+    return f"Simple daily reminders sent to {reminded} users."
+
+
+@shared_task(ignore_results=False, name="reconcile_dashboard_metrics")
+def reconcile_dashboard_metrics():
+    drift = reconcile_metrics()
+    record_task_rows(len(drift))
+    return f"Dashboard metrics reconciled, {len(drift)} values corrected."
+
+
+@shared_task(ignore_results=False, name="refresh_booking_rollups")
+def refresh_booking_rollups():
+    written = refresh_rollups()
+    record_task_rows(written)
+    return f"Booking rollups refreshed, {written} buckets written."
+
+
+@shared_task(ignore_results=False, name="archive_bookings")
+def archive_bookings(older_than_days=None):
+    moved = archive_closed_bookings(older_than_days)
+    record_task_rows(moved)
+    return f"Archived {moved} closed bookings."
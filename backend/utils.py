@@ -1,4 +1,7 @@
-from jinja2 import Template
+from jinja2 import Environment, FileSystemLoader
+
+# Templates are compiled once per process and reused from the cache.
+report_env = Environment(loader=FileSystemLoader("."), auto_reload=False, cache_size=50)
 
 def roles_list(roles):
     role_list = []
@@ -8,6 +11,4 @@ def roles_list(roles):
 
 
 def format_report(template_path, data):
-    with open(template_path) as f:
-        template = Template(f.read())
-    return template.render(data=data)
+    return report_env.get_template(template_path).render(data=data)
@@ -0,0 +1,231 @@
+"""
+Load/benchmark suite. Seeds a throwaway database with synthetic data,
+drives the real endpoints through the Flask test client from a thread
+pool, runs the Celery tasks eagerly, and writes throughput, latency
+percentiles and SQL query counts per scenario to a JSON file, along
+with the direct vs 307-bridge /api/* comparison, per-row vs batch
+tariff pricing throughput, SMTP delivery throughput (with aiosmtpd
+installed), daily reminder cost at 10k/100k accounts, catalog build
+cost as facilities and slots grow, creating and resizing a 10k-slot
+facility, and web/worker cold start times.
+The run fails if the concurrent reserves double-book a slot or leave
+the free-slot index or the cached catalog out of sync with the
+database. --scales repeats the suite at several seed sizes. The
+scenarios live in the benchmarks package, one module per area.
+
+    python benchmark.py --output bench.json
+    python benchmark.py --output new.json --compare bench.json
+    python benchmark.py --scales 1,4,16 --output sizes.json
+
+By default the run is self-contained (SQLite file in a temp dir,
+in-process cache and event broker); --redis uses the configured Redis
+for the cache and events instead.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import sqlite3
+import subprocess
+import sys
+import tempfile
+from datetime import datetime
+
+from benchmarks import admin, auth, booking, bridge, catalog, mail, plans, pricing, provisioning, startup, tasks
+from benchmarks.harness import Bench, QueryCounter, load_app, number_list, prepare, size_list
+
+SCENARIO_KEYS = ("throughput_rps", "p50_ms", "p99_ms")
+# Seed sizes multiplied by each --scales factor.
+SCALED_PARAMS = ("facilities", "slots", "accounts", "bookings")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--facilities", type=int, default=20)
+    parser.add_argument("--slots", type=int, default=4000, help="total slots across all facilities")
+    parser.add_argument("--accounts", type=int, default=1000)
+    parser.add_argument("--bookings", type=int, default=50000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=400, help="requests per scenario")
+    parser.add_argument("--startup-runs", type=int, default=5, help="cold starts timed per process type")
+    parser.add_argument("--pricing-rows", type=int, default=200000,
+                        help="synthetic stays priced per-row and in batch (default 200000)")
+    parser.add_argument("--mail-messages", type=int, default=2000,
+                        help="synthetic emails sent to an in-process aiosmtpd server (default 2000)")
+    parser.add_argument("--reminder-accounts", type=number_list, default=[10000, 100000],
+                        help="account totals the daily reminder is timed at, comma-separated; empty to skip "
+                             "(default 10000,100000)")
+    parser.add_argument("--provision-slots", type=int, default=10000,
+                        help="slots in the facility created, resized and deleted through the API; 0 to skip "
+                             "(default 10000)")
+    parser.add_argument("--catalog-sizes", type=size_list, default=[(20, 4000), (100, 20000), (400, 80000)],
+                        help="FACILITIESxSLOTS totals the catalog is timed at, comma-separated; empty to skip "
+                             "(default 20x4000,100x20000,400x80000)")
+    parser.add_argument("--scales", type=number_list, default=[1.0],
+                        help="comma-separated multipliers of the seed sizes, e.g. 1,4,16: the suite runs once "
+                             "per size in a fresh process and database (default 1)")
+    parser.add_argument("--database", help="SQLite file to use (default: a new temp file)")
+    parser.add_argument("--redis", action="store_true", help="use Redis for the cache and event broker")
+    parser.add_argument("--output", default="benchmark.json")
+    parser.add_argument("--compare", help="earlier JSON result to compare against")
+    parser.add_argument("--verbose", action="store_true", help="keep the slow request/statement log")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="relative slowdown that counts as a regression (default 0.2)")
+    return parser.parse_args()
+
+
+def run(args):
+    app, database = load_app(args)
+    if not args.verbose:
+        logging.getLogger("backend.instrumentation").setLevel(logging.ERROR)
+    counter = QueryCounter()
+    print(f"Seeding {database} ...")
+    state = prepare(app, args)
+    print(f"  {state['seed']}")
+    bench = Bench(app, counter, state, args)
+
+    print("Scenarios:")
+    scenarios = auth.run_auth_only(bench)
+    reads, version = catalog.run_catalog_reads(bench)
+    scenarios.update(reads)
+    scenarios["reserve"], reserve_started = booking.run_reserve(bench)
+    scenarios.update(catalog.run_catalog_changes(bench, version))
+    scenarios["release"] = booking.run_release(bench, reserve_started)
+    scenarios["history"] = booking.run_history(bench)
+    scenarios.update(admin.run_admin(bench))
+    scenarios.update(bridge.run_bridge(bench))
+    scenarios.update(auth.run_login(bench))
+
+    print("Provisioning:")
+    provisioned = provisioning.run_provisioning(bench, args.provision_slots) if args.provision_slots else {}
+    print("Tasks (eager):")
+    task_results = tasks.run_tasks(app)
+    print("Mail:")
+    mail_results = mail.run_mail(app, args.mail_messages)
+    print("Reminders:")
+    reminders = tasks.run_reminders(bench, args.reminder_accounts) if args.reminder_accounts else {}
+    print("Startup:")
+    startup_results = startup.run_startup(args.startup_runs)
+    print("Pricing:")
+    pricing_results = pricing.run_pricing(app, args.pricing_rows, args.seed)
+    print("Catalog by size:")
+    catalog_sizes = catalog.run_catalog_sizes(bench, args.catalog_sizes) if args.catalog_sizes else {}
+    print("Query plans:")
+    account_id = next(iter(bench.account_tokens()), 1)
+    explain = plans.explain_plans(app, bench.facilities[0], account_id)
+
+    return {
+        "meta": {
+            "timestamp": datetime.utcnow().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "cache": "redis" if args.redis else "simple",
+            "params": {k: getattr(args, k) for k in
+                       ("facilities", "slots", "accounts", "bookings", "seed", "threads", "requests")},
+        },
+        "seed": state["seed"],
+        "scenarios": scenarios,
+        "provisioning": provisioned,
+        "tasks": task_results,
+        "mail": mail_results,
+        "reminders": reminders,
+        "catalog_sizes": catalog_sizes,
+        "pricing": pricing_results,
+        "startup": startup_results,
+        "explain": explain,
+    }
+
+
+def run_scales(args):
+    """
+    Run the suite once per --scales factor, each in its own process with
+    a fresh database and seed sizes multiplied by the factor, and print
+    how each scenario changes with size.
+    """
+    runs = {}
+    for scale in args.scales:
+        label = f"x{scale:g}"
+        print(f"=== {label} ===", flush=True)
+        with tempfile.TemporaryDirectory(prefix="parking-bench-scale-") as workdir:
+            output = os.path.join(workdir, "result.json")
+            command = [sys.executable, os.path.abspath(__file__), "--output", output]
+            for key, value in vars(args).items():
+                if key in ("output", "compare", "database", "scales") or value is None or value is False:
+                    continue
+                if key in SCALED_PARAMS:
+                    value = max(1, round(value * scale))
+                command.append("--" + key.replace("_", "-"))
+                if value is not True:
+                    command.append(",".join("x".join(map(str, v)) if isinstance(v, tuple) else str(v) for v in value)
+                                   if isinstance(value, list) else str(value))
+            subprocess.run(command, check=True)
+            with open(output) as f:
+                runs[label] = json.load(f)
+    print("Scenarios by size (rps / p50 ms / q/req):")
+    print(f"  {'':<18} " + "".join(f"{label:>26}" for label in runs))
+    for name in next(iter(runs.values()))["scenarios"]:
+        cells = []
+        for run in runs.values():
+            scenario = run["scenarios"].get(name, {})
+            cells.append(f"{scenario.get('throughput_rps', 0):>9} / {scenario.get('p50_ms', 0):>7} / "
+                         f"{scenario.get('queries_per_request', 0):>4}")
+        print(f"  {name:<18} " + "".join(f"{cell:>26}" for cell in cells))
+    return {"scales": runs}
+
+
+def compare(result, baseline_path, tolerance):
+    """
+    Print per-scenario changes against a baseline; return the regressions.
+    Multi-size results are compared size by size.
+    """
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    if "scales" in result:
+        pairs = [(f"{label} ", run, baseline.get("scales", {}).get(label, {}))
+                 for label, run in result["scales"].items()]
+    else:
+        pairs = [("", result, baseline)]
+    regressions = []
+    print(f"Compared with {baseline_path}:")
+    for prefix, run, previous_run in pairs:
+        regressions += _compare_scenarios(prefix, run, previous_run, tolerance)
+    if regressions:
+        print("Regressions: " + ", ".join(regressions))
+    return regressions
+
+
+def _compare_scenarios(prefix, result, baseline, tolerance):
+    regressions = []
+    for name, current in result["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if not previous:
+            continue
+        changes = []
+        for key in SCENARIO_KEYS:
+            old, new = previous.get(key), current.get(key)
+            if not old:
+                continue
+            delta = (new - old) / old
+            changes.append(f"{key} {old} -> {new} ({delta:+.0%})")
+            worse = delta < -tolerance if key == "throughput_rps" else delta > tolerance
+            if worse:
+                regressions.append(f"{prefix}{name}.{key}")
+        print(f"  {prefix}{name:<18} " + ", ".join(changes))
+    return regressions
+
+
+def main():
+    args = parse_args()
+    result = run(args) if args.scales == [1.0] else run_scales(args)
+    with open(args.output, "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"Wrote {args.output}")
+    if args.compare and compare(result, args.compare, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
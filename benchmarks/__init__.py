@@ -0,0 +1,4 @@
+"""
+Benchmark scenarios, one module per area; benchmark.py at the repo root
+seeds the database and runs them in order.
+"""
@@ -0,0 +1,19 @@
+"""Admin reads: accounts, the dashboard summary and the rollups."""
+
+
+def run_admin(bench):
+    """The admin reads; admin_summary_cold prices the open bookings on every request."""
+    from backend.dashboard import PROJECTED_REVENUE_KEY
+
+    def cold_summary(c, rng, i):
+        bench.app.cache.delete(PROJECTED_REVENUE_KEY)
+        return c.get("/admin/summary", headers=bench.admin)
+    return {
+        "admin_accounts": bench.scenario("admin_accounts",
+            lambda c, rng, i: c.get("/admin/accounts?limit=100&bookings_limit=5", headers=bench.admin)),
+        "admin_summary": bench.scenario("admin_summary",
+            lambda c, rng, i: c.get("/admin/summary", headers=bench.admin)),
+        "admin_summary_cold": bench.scenario("admin_summary_cold", cold_summary),
+        "admin_rollups": bench.scenario("admin_rollups",
+            lambda c, rng, i: c.get("/admin/rollups?granularity=day", headers=bench.admin)),
+    }
@@ -0,0 +1,30 @@
+"""Token authentication on its own, and password login."""
+
+
+def run_auth_only(bench):
+    """Token-authenticated requests through the identity cache, then through Flask-Security's loaders."""
+    def auth_only(c, rng, i):
+        return c.get("/admin/home", headers=bench.admin)
+    results = {"auth_only": bench.scenario("auth_only", auth_only)}
+    bench.app.config["AUTH_IDENTITY_CACHE"] = False
+    try:
+        results["auth_only_uncached"] = bench.scenario("auth_only_uncached", auth_only)
+    finally:
+        bench.app.config["AUTH_IDENTITY_CACHE"] = True
+    return results
+
+
+def run_login(bench):
+    """Password logins hashed in the process pool, then inline on the request threads."""
+    from backend.passwords import password_hasher
+
+    def login(c, rng, i):
+        return c.post("/auth/login", json={"email": rng.choice(bench.state["user_emails"]), "password": "password"})
+    total = min(bench.requests, 100)
+    results = {"login": bench.scenario("login", login, total=total, ok=(200,))}
+    workers, password_hasher.workers = password_hasher.workers, 0
+    try:
+        results["login_inline"] = bench.scenario("login_inline", login, total=total, ok=(200,))
+    finally:
+        password_hasher.workers = workers
+    return results
@@ -0,0 +1,97 @@
+"""Reserving and releasing slots concurrently, and paging booking history."""
+from datetime import datetime
+from .checks import double_booked_slots, journal_mode, require_index_in_sync
+
+
+def open_bookings(app, since):
+    from backend.database import db
+    from backend.models import Account, Booking
+    with app.app_context():
+        return db.session.execute(
+            db.select(Account.account_id, Booking.slot_id)
+            .join(Booking, Booking.account_id == Account.account_id)
+            .where(Booking.end_time.is_(None), Booking.start_time >= since)
+        ).all()
+
+
+def free_slots(app, facility_ids=None):
+    from backend.database import db
+    from backend.models import Slot
+    query = db.select(db.func.count(Slot.slot_id)).where(Slot.slot_state == "A")
+    if facility_ids is not None:
+        query = query.where(Slot.facility_id.in_(facility_ids))
+    with app.app_context():
+        return db.session.scalar(query)
+
+
+class Reserver:
+    """
+    Makes reserve requests for a scenario and remembers the facilities
+    that answered "No free slots available". No scenario releases while
+    reserving, so a facility that answered full must still be full
+    afterwards; check() fails the run otherwise.
+    """
+
+    def __init__(self, bench, prefix):
+        self.bench = bench
+        self.prefix = prefix
+        self.full = set()
+
+    def __call__(self, c, rng, i):
+        facility_id = rng.choice(self.bench.facilities)
+        response = c.post("/booking/reserve", headers=self.bench.user(rng),
+                          json={"facility_id": facility_id, "vehicle_no": f"{self.prefix}{i}"})
+        if self.is_full(response):
+            self.full.add(facility_id)
+        return response
+
+    @staticmethod
+    def is_full(response):
+        return response.status_code == 400 and response.get_json().get("message") == "No free slots available"
+
+    def check(self, result):
+        result["full_facilities"] = len(self.full)
+        if self.full and free_slots(self.bench.app, self.full):
+            raise SystemExit(f"Facilities {sorted(self.full)} answered full while they still had free slots")
+
+
+def run_reserve(bench):
+    """
+    Concurrent reserves, failing the run if any slot ends up
+    double-booked or a facility claims to be full while it is not.
+    Returns the scenario and when it started.
+    """
+    available = free_slots(bench.app)
+    planned = bench.requests + bench.requests // 2
+    if available < planned:
+        print(f"  note: {available} free slots for about {planned} reserves; expect full facilities")
+    started = datetime.utcnow()
+    reserver = Reserver(bench, "BENCH")
+    result = bench.scenario("reserve", reserver, rejected=Reserver.is_full)
+    reserver.check(result)
+    result["journal_mode"] = journal_mode(bench.app)
+    double_booked = double_booked_slots(bench.app)
+    result["double_booked_slots"] = len(double_booked)
+    print(f"  reserve: {result['throughput_rps']} reserves/s on "
+          f"{result['journal_mode']}, {len(double_booked)} double-booked slots")
+    if double_booked:
+        raise SystemExit(f"Double-booked slots after the reserve run: {double_booked[:20]}")
+    return result, started
+
+
+def run_release(bench, since):
+    """Release every booking the seeded users opened since `since`, one at a time."""
+    tokens_by_account = bench.account_tokens()
+    to_release = [(tokens_by_account[a], slot_id) for a, slot_id in open_bookings(bench.app, since)
+                  if a in tokens_by_account]
+    result = bench.scenario("release",
+        lambda c, rng, i: c.post("/booking/release", headers={"Authentication-Token": to_release[i][0]},
+                                 json={"slot_id": to_release[i][1]}),
+        total=len(to_release), threads=1)
+    require_index_in_sync(bench.app, result, "reserve/release")
+    return result
+
+
+def run_history(bench):
+    return bench.scenario("history",
+        lambda c, rng, i: c.get("/booking/history?limit=50", headers=bench.user(rng)))
@@ -0,0 +1,25 @@
+"""The /api/* frontend paths served directly vs through the 307 redirect bridge."""
+
+
+def run_bridge(bench):
+    """
+    The same /api/* reads served directly and with API_REDIRECT_BRIDGE
+    on, which answers them with a 307 to the canonical path first.
+    """
+    def bridge(hops):
+        def request(c, rng, i):
+            path = "/api/lot" if i % 2 else "/api/users?limit=100&bookings_limit=5"
+            response = c.get(path, headers=bench.admin, follow_redirects=True)
+            hops.append(len(response.history) + 1)
+            return response
+        return request
+    scenarios = {}
+    for name, redirected in (("bridge_direct", False), ("bridge_redirect", True)):
+        hops = []
+        bench.app.config["API_REDIRECT_BRIDGE"] = redirected
+        try:
+            scenarios[name] = bench.scenario(name, bridge(hops))
+        finally:
+            bench.app.config["API_REDIRECT_BRIDGE"] = False
+        scenarios[name]["http_requests_per_call"] = round(sum(hops) / len(hops), 2) if hops else 0.0
+    return scenarios
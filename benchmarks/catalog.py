@@ -0,0 +1,111 @@
+"""/catalog/facility reads, their cache under concurrent reserves, and catalog cost by size."""
+from .booking import Reserver
+from .checks import stale_catalog_entries
+from .harness import timed
+
+
+def run_catalog_reads(bench):
+    """Full and compact catalog reads; returns the scenarios and the catalog version they saw."""
+    scenarios = {
+        "catalog_full": bench.scenario("catalog_full",
+            lambda c, rng, i: c.get("/catalog/facility", headers=bench.user(rng))),
+        "catalog_compact": bench.scenario("catalog_compact",
+            lambda c, rng, i: c.get("/catalog/facility?format=compact", headers=bench.user(rng))),
+    }
+    version = bench.app.test_client().get("/catalog/facility?format=compact", headers=bench.admin).get_json()["version"]
+    return scenarios, version
+
+
+def run_catalog_changes(bench, version):
+    """Delta reads since `version`, then reads mixed with reserves, checked against a fresh build."""
+    scenarios = {"catalog_delta": bench.scenario("catalog_delta",
+        lambda c, rng, i: c.get(f"/catalog/facility?since={version}", headers=bench.user(rng)))}
+
+    reserver = Reserver(bench, "MIXED")
+
+    def read_or_reserve(c, rng, i):
+        if rng.random() < 0.5:
+            return c.get("/catalog/facility?format=compact", headers=bench.user(rng))
+        return reserver(c, rng, i)
+    scenarios["catalog_mixed"] = mixed = bench.scenario("catalog_mixed", read_or_reserve, rejected=Reserver.is_full)
+    reserver.check(mixed)
+    stale = stale_catalog_entries(bench.app)
+    mixed["stale_entries"] = len(stale)
+    print(f"  catalog cache: {len(stale)} stale entries after concurrent reads and reserves")
+    if stale:
+        raise SystemExit(f"Cached catalog entries out of date for facilities {stale}")
+    return scenarios
+
+
+def per_facility_catalog():
+    """The catalog as FacilityApi.get built it before the set-based builder: N+1 queries."""
+    from backend.models import Facility, Slot
+    result = []
+    for fac in Facility.query.all():
+        slots = Slot.query.filter_by(facility_id=fac.facility_id).order_by(Slot.slot_id).all()
+        result.append({
+            "id": fac.facility_id,
+            "place_label": fac.place_label,
+            "hourly_rate": fac.hourly_rate,
+            "zipcode": fac.zipcode,
+            "total_slots": len(slots),
+            "occupied_slots": sum(1 for s in slots if s.slot_state == "O"),
+            "slots": [{"number": idx + 1, "status": s.slot_state, "facilityId": fac.facility_id}
+                      for idx, s in enumerate(slots)]
+        })
+    return result
+
+
+def run_catalog_sizes(bench, sizes):
+    """
+    Grow the seeded facilities and slots to each FACILITIESxSLOTS size in
+    turn and time the catalog at that size: the old per-facility builder,
+    build_facility_catalog, and /catalog/facility with every cached
+    entry invalidated (cold) and cached (warm). Reports the median
+    latency and the SQL statements of each.
+    """
+    from backend.database import db
+    from backend.models import Facility, Slot
+    from backend.seed import seed_database
+    from backend.catalog import build_facility_catalog
+    from backend.cache import invalidate_facility
+    app, counter = bench.app, bench.counter
+    client = app.test_client()
+    results = {}
+
+    def invalidate_all():
+        with app.app_context():
+            for facility_id in db.session.scalars(db.select(Facility.facility_id)):
+                invalidate_facility(facility_id)
+
+    def in_context(build):
+        def call():
+            with app.app_context():
+                build()
+        return call
+
+    def get_catalog():
+        client.get("/catalog/facility", headers=bench.admin).close()
+
+    for facilities, slots in sizes:
+        with app.app_context():
+            have_facilities = db.session.scalar(db.select(db.func.count(Facility.facility_id)))
+            have_slots = db.session.scalar(db.select(db.func.count(Slot.slot_id)))
+            if facilities > have_facilities and slots > have_slots:
+                seed_database(facilities - have_facilities, slots - have_slots, accounts=1, bookings=0,
+                              seed=bench.args.seed + facilities)
+            have_facilities = db.session.scalar(db.select(db.func.count(Facility.facility_id)))
+            have_slots = db.session.scalar(db.select(db.func.count(Slot.slot_id)))
+        result = {
+            "facilities": have_facilities,
+            "slots": have_slots,
+            "per_facility_build": timed(counter, in_context(per_facility_catalog)),
+            "set_based_build": timed(counter, in_context(build_facility_catalog)),
+            "endpoint_cold": timed(counter, get_catalog, setup=invalidate_all),
+            "endpoint_warm": timed(counter, get_catalog),
+        }
+        results[f"{have_facilities}x{have_slots}"] = result
+        print(f"  {have_facilities:>5} facilities {have_slots:>7} slots  " + "  ".join(
+            f"{name} {result[name]['ms']} ms/{result[name]['queries']} q"
+            for name in ("per_facility_build", "set_based_build", "endpoint_cold", "endpoint_warm")))
+    return results
@@ -0,0 +1,42 @@
+"""Consistency checks run between scenarios; a failed check aborts the run."""
+
+
+def double_booked_slots(app):
+    """Slots with more than one open booking; must always be empty."""
+    from backend.database import db
+    with app.app_context():
+        return db.session.scalars(db.text(
+            "SELECT slot_id FROM bookings WHERE end_time IS NULL GROUP BY slot_id HAVING count(*) > 1"
+        )).all()
+
+
+def index_mismatches(app):
+    """Facilities whose in-process free-slot index disagrees with the DB."""
+    from backend.slot_index import slot_index
+    with app.app_context():
+        return slot_index.mismatches()
+
+
+def stale_catalog_entries(app):
+    """Facilities whose cached catalog entry differs from a fresh build."""
+    from backend.cache import get_facility_catalog
+    from backend.catalog import build_facility_catalog
+    with app.app_context():
+        cached = {f["id"]: f for f in get_facility_catalog()}
+        fresh = {f["id"]: f for f in build_facility_catalog()}
+    return sorted(fid for fid in set(cached) | set(fresh) if cached.get(fid) != fresh.get(fid))
+
+
+def journal_mode(app):
+    from backend.database import db
+    with app.app_context():
+        return db.session.scalar(db.text("PRAGMA journal_mode"))
+
+
+def require_index_in_sync(app, result, after):
+    """Record and enforce the free-slot index check after a scenario."""
+    drifted = index_mismatches(app)
+    result["slot_index_mismatches"] = len(drifted)
+    print(f"  slot index: {len(drifted)} facilities out of sync after {after}")
+    if drifted:
+        raise SystemExit(f"Free-slot index out of sync for facilities {drifted} after {after}")
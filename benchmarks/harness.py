@@ -0,0 +1,193 @@
+"""Shared plumbing: the benchmark app, the seeded state and the scenario runner."""
+import os
+import random
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def number_list(text):
+    return [float(value) for value in text.split(",") if value.strip()]
+
+
+def size_list(text):
+    """"20x4000,100x20000" -> [(20, 4000), (100, 20000)]"""
+    sizes = []
+    for value in text.split(","):
+        if value.strip():
+            facilities, slots = value.lower().split("x")
+            sizes.append((int(facilities), int(slots)))
+    return sorted(sizes)
+
+
+def load_app(args):
+    """
+    Point the app at the benchmark database and a temporary export
+    directory, build it and create the schema.
+    """
+    workdir = tempfile.mkdtemp(prefix="parking-bench-")
+    database = args.database or os.path.join(workdir, "bench.sqlite3")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.abspath(database)}"
+    os.environ["EXPORT_DIR"] = os.path.join(workdir, "exports")
+    if not args.redis:
+        os.environ["CACHE_TYPE"] = "SimpleCache"
+        os.environ["EVENT_BROKER"] = "memory"
+    from app import create_app
+    from backend.config import LocalDevelopmentConfig
+    from backend.celery_init import get_celery
+    from backend.commands import init_database
+
+    class BenchmarkConfig(LocalDevelopmentConfig):
+        # SimpleCache evicts a third of its keys on every set past its
+        # threshold (500 by default); Redis has no such limit.
+        CACHE_THRESHOLD = 1000000
+    app = create_app(BenchmarkConfig)
+    get_celery(app).conf.update(
+        broker_url="memory://", result_backend="cache+memory://",
+        task_always_eager=True, task_store_eager_result=True
+    )
+    with app.app_context():
+        init_database()
+    return app, database
+
+
+class QueryCounter:
+    """Counts SQL statements per thread via the engine's cursor events."""
+
+    def __init__(self):
+        self._local = threading.local()
+        from sqlalchemy import event
+        from sqlalchemy.engine import Engine
+        event.listen(Engine, "after_cursor_execute", self._count)
+
+    def _count(self, *args):
+        self._local.count = getattr(self._local, "count", 0) + 1
+
+    def get(self):
+        return getattr(self._local, "count", 0)
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[idx]
+
+
+def run_scenario(app, counter, name, make_request, total, threads, ok=(200, 201, 202, 304), rejected=None):
+    """
+    Issue `total` requests from `threads` workers and summarise them.
+    Responses matching the `rejected` predicate (an expected refusal,
+    such as a full facility) are counted apart from the errors.
+    """
+    latencies, queries, errors, refusals = [], [], [], []
+    lock = threading.Lock()
+    per_thread = [total // threads + (1 if i < total % threads else 0) for i in range(threads)]
+
+    def worker(worker_id, count):
+        client = app.test_client()
+        rng = random.Random(worker_id)
+        for i in range(count):
+            before = counter.get()
+            started = time.perf_counter()
+            response = make_request(client, rng, i)
+            elapsed = time.perf_counter() - started
+            refused = rejected is not None and rejected(response)
+            response.close()
+            with lock:
+                latencies.append(elapsed)
+                queries.append(counter.get() - before)
+                if refused:
+                    refusals.append(response.status_code)
+                elif response.status_code not in ok:
+                    errors.append(response.status_code)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        for future in [pool.submit(worker, i, n) for i, n in enumerate(per_thread) if n]:
+            future.result()
+    wall = time.perf_counter() - started
+    latencies.sort()
+    result = {
+        "requests": len(latencies),
+        "threads": threads,
+        "errors": len(errors),
+        "rejected": len(refusals),
+        "throughput_rps": round(len(latencies) / wall, 2) if wall else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3) if latencies else 0.0,
+        "queries_per_request": round(sum(queries) / len(queries), 2) if queries else 0.0,
+    }
+    print(f"  {name:<18} {result['throughput_rps']:>9} rps  p50 {result['p50_ms']:>8} ms  "
+          f"p99 {result['p99_ms']:>8} ms  {result['queries_per_request']:>6} q/req  errors {result['errors']}"
+          + (f"  rejected {result['rejected']}" if refusals else ""))
+    return result
+
+
+def timed(counter, call, repeats=5, setup=None):
+    """Median latency of `call` over `repeats` runs and its SQL statement count."""
+    seconds, queries = [], 0
+    for _ in range(repeats):
+        if setup:
+            setup()
+        before, started = counter.get(), time.perf_counter()
+        call()
+        seconds.append(time.perf_counter() - started)
+        queries = counter.get() - before
+    seconds.sort()
+    return {"ms": round(percentile(seconds, 50) * 1000, 2), "queries": queries}
+
+
+def prepare(app, args):
+    from backend.database import db
+    from backend.models import Account, Facility
+    from backend.seed import seed_database, SEED_EMAIL
+    with app.app_context():
+        started = time.perf_counter()
+        summary = seed_database(args.facilities, args.slots, args.accounts, args.bookings, seed=args.seed)
+        summary["seconds"] = round(time.perf_counter() - started, 2)
+        admin = app.security.datastore.find_user(mail="astha@gmail.com")
+        users = db.session.scalars(
+            db.select(Account).where(Account.mail.like(SEED_EMAIL.format("%"))).order_by(Account.account_id).limit(200)
+        ).all()
+        return {
+            "seed": summary,
+            "admin_token": admin.get_auth_token(),
+            "user_tokens": [u.get_auth_token() for u in users],
+            "user_emails": [u.mail for u in users],
+            "facility_ids": db.session.scalars(db.select(Facility.facility_id)).all(),
+        }
+
+
+class Bench:
+    """What the scenario modules share: the app, the query counter and the seeded tokens."""
+
+    def __init__(self, app, counter, state, args):
+        self.app = app
+        self.counter = counter
+        self.state = state
+        self.args = args
+        self.admin = {"Authentication-Token": state["admin_token"]}
+        self.users = [{"Authentication-Token": token} for token in state["user_tokens"]]
+        self.facilities = state["facility_ids"]
+        self.requests = args.requests
+        self.threads = args.threads
+
+    def user(self, rng):
+        return rng.choice(self.users)
+
+    def scenario(self, name, make_request, total=None, threads=None, **kwargs):
+        return run_scenario(self.app, self.counter, name, make_request,
+                            self.requests if total is None else total,
+                            self.threads if threads is None else threads, **kwargs)
+
+    def account_tokens(self):
+        with self.app.app_context():
+            return {
+                self.app.security.datastore.find_user(mail=email).account_id: token
+                for token, email in zip(self.state["user_tokens"], self.state["user_emails"])
+            }
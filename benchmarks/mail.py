@@ -0,0 +1,85 @@
+"""SMTP delivery throughput against an in-process aiosmtpd server."""
+import logging
+import os
+import socket
+import time
+from .harness import REPO_DIR
+
+
+class _CountingSMTPHandler:
+    """aiosmtpd handler that accepts everything except *@refused.invalid."""
+
+    def __init__(self):
+        self.received = 0
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address.endswith("@refused.invalid"):
+            return "550 No such user"
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        self.received += 1
+        return "250 Message accepted"
+
+
+def run_mail(app, messages):
+    """
+    Start an in-process aiosmtpd server, point the SMTP pool at it and
+    time bulk delivery of synthetic messages (one in ten to a refused
+    address), then the daily reminder and monthly report tasks run
+    eagerly. Runs from the repo root, where the report templates are
+    looked up. Skipped when aiosmtpd is not installed.
+    """
+    try:
+        from aiosmtpd.controller import Controller
+    except ImportError:
+        print("  skipped: aiosmtpd is not installed")
+        return {"skipped": "aiosmtpd is not installed"}
+    from backend.mail import smtp_pool
+    from backend.tasks import send_email_batch, daily_reminder, monthly_reservation_report
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    handler = _CountingSMTPHandler()
+    controller = Controller(handler, hostname="127.0.0.1", port=port)
+    controller.start()
+    smtp_pool.close()
+    previous = smtp_pool.host, smtp_pool.port
+    smtp_pool.host, smtp_pool.port = "127.0.0.1", port
+    logging.getLogger("backend.mail").setLevel(logging.ERROR)
+    working_dir = os.getcwd()
+    os.chdir(REPO_DIR)
+    results = {}
+    try:
+        emails = [{
+            "to_address": f"bench{i}@refused.invalid" if i % 10 == 0 else f"bench{i}@example.com",
+            "subject": "Benchmark", "message": "Benchmark message " * 20, "content": "plain"
+        } for i in range(messages)]
+        with app.app_context():
+            started = time.perf_counter()
+            outcome = send_email_batch.apply(args=(emails,))
+            seconds = time.perf_counter() - started
+            results["bulk"] = {
+                "messages": messages,
+                "sent": outcome.result["sent"],
+                "refused": len(outcome.result["failed"]),
+                "messages_per_s": round(messages / seconds) if seconds else 0,
+            }
+            for name, task in (("daily_reminder", daily_reminder),
+                               ("monthly_reservation_report", monthly_reservation_report)):
+                before = handler.received
+                started = time.perf_counter()
+                outcome = task.apply()
+                seconds = time.perf_counter() - started
+                delivered = handler.received - before
+                results[name] = {"seconds": round(seconds, 3), "state": outcome.state, "delivered": delivered,
+                                 "messages_per_s": round(delivered / seconds) if seconds else 0}
+    finally:
+        os.chdir(working_dir)
+        smtp_pool.close()
+        smtp_pool.host, smtp_pool.port = previous
+        controller.stop()
+    for name, result in results.items():
+        print(f"  {name:<28} {result}")
+    return results
@@ -0,0 +1,77 @@
+"""EXPLAIN QUERY PLAN and timings for the hot lookups, with and without their indexes."""
+import time
+from .harness import percentile
+
+# Tables whose explicit indexes serve the statements below.
+INDEXED_TABLES = ("slots", "bookings", "account_group_link", "booking_archive")
+
+
+def _statements(facility_id, account_id):
+    return {
+        "reserve_pick_free_slot": ("SELECT slot_id FROM slots WHERE facility_id = :f AND slot_state = 'A' "
+                                   "ORDER BY slot_id LIMIT 1", {"f": facility_id}),
+        "slot_by_position": ("SELECT slot_id FROM slots WHERE facility_id = :f AND position = 1",
+                             {"f": facility_id}),
+        "release_open_booking": ("SELECT booking_id FROM bookings WHERE slot_id = 1 AND account_id = :a "
+                                 "AND end_time IS NULL", {"a": account_id}),
+        "history_page": ("SELECT booking_id FROM bookings WHERE account_id = :a "
+                         "ORDER BY start_time DESC LIMIT 50", {"a": account_id}),
+        "account_roles": ("SELECT group_id FROM account_group_link WHERE account_id = :a", {"a": account_id}),
+        "history_keyset_hot": ("SELECT booking_id FROM bookings WHERE account_id = :a AND booking_id < 1000000 "
+                               "ORDER BY booking_id DESC LIMIT 50", {"a": account_id}),
+        "history_keyset_archive": ("SELECT booking_id FROM booking_archive WHERE account_id = :a "
+                                   "AND booking_id < 1000000 ORDER BY booking_id DESC LIMIT 50", {"a": account_id}),
+    }
+
+
+def _measure(engine, statements, repeats):
+    """Plan and median latency of each statement on a fresh connection."""
+    from sqlalchemy import text
+    # Pooled connections keep statements prepared against the old schema
+    # (and report their stale plans), so start from new connections.
+    engine.dispose()
+    results = {}
+    with engine.connect() as conn:
+        for name, (sql, params) in statements.items():
+            plan = [row[-1] for row in conn.execute(text(f"EXPLAIN QUERY PLAN {sql}"), params)]
+            seconds = []
+            for _ in range(repeats):
+                started = time.perf_counter()
+                conn.execute(text(sql), params).all()
+                seconds.append(time.perf_counter() - started)
+            seconds.sort()
+            results[name] = {"plan": plan, "ms": round(percentile(seconds, 50) * 1000, 3)}
+    return results
+
+
+def explain_plans(app, facility_id, account_id, repeats=20):
+    """
+    EXPLAIN QUERY PLAN and the median latency of each hot lookup, first
+    with the models' indexes, then with the explicit indexes of the
+    tables involved dropped, and again once they are recreated. Fails
+    the run if a recreated index does not restore the original plan.
+    """
+    from backend.database import db
+    statements = _statements(facility_id, account_id)
+    indexes = [index for name in INDEXED_TABLES for index in db.metadata.tables[name].indexes]
+    with app.app_context():
+        indexed = _measure(db.engine, statements, repeats)
+        with db.engine.begin() as conn:
+            for index in indexes:
+                index.drop(conn)
+        unindexed = _measure(db.engine, statements, repeats)
+        with db.engine.begin() as conn:
+            for index in indexes:
+                index.create(conn)
+        restored = _measure(db.engine, statements, repeats)
+
+    results = {}
+    for name in statements:
+        results[name] = {"indexed": indexed[name], "unindexed": unindexed[name]}
+        print(f"  {name:<24} {unindexed[name]['ms']:>8} ms without indexes  {indexed[name]['ms']:>8} ms with")
+        print(f"    without: {'; '.join(unindexed[name]['plan'])}")
+        print(f"    with:    {'; '.join(indexed[name]['plan'])}")
+    lost = [name for name in statements if restored[name]["plan"] != indexed[name]["plan"]]
+    if lost:
+        raise SystemExit(f"Recreated indexes did not restore the plans of {lost}")
+    return results
@@ -0,0 +1,58 @@
+"""Creating, growing, shrinking and deleting a large facility through the API."""
+import time
+from .checks import index_mismatches
+
+
+def run_provisioning(bench, slots, cycles=3):
+    """
+    Create a facility with `slots` slots, grow it by half, shrink it to
+    half its original size, delete its first slot and delete it,
+    `cycles` times over. Reports the median latency and the SQL
+    statements of each step, and fails the run if the free-slot index
+    disagrees with the DB after any resize or slot delete.
+    """
+    from backend.database import db
+    from backend.models import Facility
+    client = bench.app.test_client()
+    steps = {"create": [], "grow": [], "shrink": [], "delete_slot": [], "delete": []}
+    queries = {}
+    drifted = {}
+
+    def step(name, call, expected):
+        before, started = bench.counter.get(), time.perf_counter()
+        response = call()
+        steps[name].append(time.perf_counter() - started)
+        queries[name] = bench.counter.get() - before
+        if response.status_code != expected:
+            raise SystemExit(f"Provisioning step {name} answered {response.status_code}: {response.get_json()}")
+        if name in ("grow", "shrink", "delete_slot"):
+            drifted.setdefault(name, set()).update(index_mismatches(bench.app))
+        return response
+
+    for cycle in range(cycles):
+        label = f"Bench Provisioning {cycle}"
+        body = {"place_label": label, "hourly_rate": 20, "zipcode": "110001"}
+        step("create", lambda: client.post("/catalog/facility", headers=bench.admin,
+                                           json={**body, "total_slots": slots}), 201)
+        with bench.app.app_context():
+            facility_id = db.session.scalar(db.select(Facility.facility_id).where(Facility.place_label == label))
+        path = f"/catalog/facility/{facility_id}"
+        step("grow", lambda: client.put(path, headers=bench.admin,
+                                        json={**body, "total_slots": slots + slots // 2}), 200)
+        step("shrink", lambda: client.put(path, headers=bench.admin,
+                                          json={**body, "total_slots": slots // 2}), 200)
+        step("delete_slot", lambda: client.delete(f"/catalog/slot/{facility_id}/1", headers=bench.admin), 200)
+        step("delete", lambda: client.delete(path, headers=bench.admin), 200)
+
+    bad = sorted(set().union(*drifted.values()))
+    results = {"slots": slots, "cycles": cycles, "slot_index_mismatches": len(bad)}
+    for name, seconds in steps.items():
+        seconds.sort()
+        results[name] = {"ms": round(seconds[len(seconds) // 2] * 1000, 2), "queries": queries[name]}
+    print(f"  {slots} slots  " + "  ".join(
+        f"{name} {results[name]['ms']} ms/{results[name]['queries']} q" for name in steps))
+    print(f"  slot index: {len(bad)} facilities out of sync after resizes and slot deletes")
+    if bad:
+        raise SystemExit(f"Free-slot index out of sync for facilities {bad} after "
+                         + ", ".join(name for name, ids in drifted.items() if ids))
+    return results
@@ -0,0 +1,54 @@
+"""Cold start of fresh web and worker processes."""
+import os
+import subprocess
+import sys
+from .harness import REPO_DIR, percentile
+
+# What each process does before it can serve: first request / tasks registered.
+STARTUP_PROBES = {
+    "web": "from wsgi import app; app.test_client().get('/')",
+    "worker": "from worker import celery; celery.loader.import_default_modules()",
+}
+
+HEAVY_IMPORTS = ("sqlalchemy", "flask_security", "flask_restful", "celery", "numpy", "jinja2", "redis")
+
+
+def _import_times(stderr):
+    """Parse `python -X importtime` output into {module: cumulative ms}."""
+    imports = {}
+    for line in stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            _, cumulative, name = line.split("|")
+            if cumulative.strip().isdigit():
+                imports[name.strip()] = int(cumulative) / 1000
+    return imports
+
+
+def run_startup(runs):
+    """
+    Start fresh interpreters against the seeded database and time cold
+    start for the web app (to its first response) and the Celery worker
+    (to its tasks being registered), plus the -X importtime cost of the
+    entry module and of the heavy packages it pulls in (null if not
+    loaded).
+    """
+    results = {}
+    for name, probe in STARTUP_PROBES.items():
+        timed = f"import time; t = time.perf_counter(); {probe}; print(time.perf_counter() - t)"
+        seconds = sorted(
+            float(subprocess.run([sys.executable, "-c", timed], cwd=REPO_DIR, env=os.environ,
+                                 capture_output=True, text=True, check=True).stdout.split()[-1])
+            for _ in range(runs)
+        )
+        traced = subprocess.run([sys.executable, "-X", "importtime", "-c", probe], cwd=REPO_DIR, env=os.environ,
+                                capture_output=True, text=True, check=True)
+        imports = _import_times(traced.stderr)
+        entry = probe.split()[1]
+        results[name] = {
+            "cold_start_ms": round(percentile(seconds, 50) * 1000, 1),
+            "import_ms": round(imports.get(entry, 0.0), 1),
+            "packages_ms": {package: round(imports[package], 1) if package in imports else None
+                            for package in HEAVY_IMPORTS},
+        }
+        print(f"  {name:<8} cold start {results[name]['cold_start_ms']} ms, import {results[name]['import_ms']} ms")
+    return results
@@ -0,0 +1,76 @@
+"""The Celery tasks run eagerly, and the daily reminder as accounts grow."""
+import time
+from datetime import datetime
+
+
+def run_tasks(app):
+    from backend.tasks import (download_reservations_csv, reconcile_dashboard_metrics, refresh_booking_rollups,
+                               archive_bookings)
+    results = {}
+    with app.app_context():
+        for name, task, kwargs in (
+            ("export_csv", download_reservations_csv, {}),
+            ("export_csv_gzip", download_reservations_csv, {"compress": True}),
+            ("reconcile_dashboard_metrics", reconcile_dashboard_metrics, {}),
+            ("refresh_booking_rollups", refresh_booking_rollups, {}),
+            ("archive_bookings", archive_bookings, {"older_than_days": 30}),
+        ):
+            started = time.perf_counter()
+            outcome = task.apply(kwargs=kwargs)
+            results[name] = {"seconds": round(time.perf_counter() - started, 3), "state": outcome.state}
+    for name, result in results.items():
+        print(f"  {name:<28} {result}")
+    return results
+
+
+def run_reminders(bench, sizes):
+    """
+    Grow the seeded accounts to each size in turn and time the reminder
+    path: paging through _inactive_accounts, then daily_reminder twice,
+    the second run finding everyone already reminded. The reminder
+    emails are queued on the in-memory broker rather than delivered, so
+    only the task's own queries and fan-out are timed.
+    """
+    from backend.database import db
+    from backend.models import Account
+    from backend.seed import seed_database
+    from backend.celery_init import get_celery
+    from backend.tasks import _inactive_accounts, daily_reminder, REMINDER_INACTIVITY, REMINDER_SENT_KEY
+    app, counter, seed = bench.app, bench.counter, bench.args.seed
+    results = {}
+    celery = get_celery(app)
+    with app.app_context():
+        for size in sorted(int(size) for size in sizes):
+            missing = size - db.session.scalar(db.select(db.func.count(Account.account_id)))
+            started = time.perf_counter()
+            if missing > 0:
+                seed_database(facilities=0, slots=0, accounts=missing, bookings=0, seed=seed + size)
+            seeded = time.perf_counter() - started
+            account_ids = db.session.scalars(db.select(Account.account_id)).all()
+            for account_id in account_ids:
+                app.cache.delete(REMINDER_SENT_KEY.format(account_id))
+
+            before, started = counter.get(), time.perf_counter()
+            pages = rows = 0
+            for page in _inactive_accounts(datetime.utcnow() - REMINDER_INACTIVITY):
+                pages += 1
+                rows += len(page)
+            result = {"accounts": len(account_ids), "seed_seconds": round(seeded, 2),
+                      "inactive": rows, "pages": pages, "page_queries": counter.get() - before,
+                      "page_seconds": round(time.perf_counter() - started, 3)}
+            celery.conf.task_always_eager = False
+            try:
+                for run in ("first", "repeat"):
+                    before, started = counter.get(), time.perf_counter()
+                    outcome = daily_reminder.apply()
+                    result[f"{run}_seconds"] = round(time.perf_counter() - started, 3)
+                    result[f"{run}_queries"] = counter.get() - before
+                    result[f"{run}_state"] = outcome.state
+                    result[f"{run}_result"] = outcome.result
+            finally:
+                celery.conf.task_always_eager = True
+            results[str(size)] = result
+            print(f"  {size:>8} accounts  {rows} inactive in {pages} pages, {result['page_queries']} queries, "
+                  f"{result['page_seconds']} s; daily_reminder {result['first_seconds']} s "
+                  f"({result['first_queries']} q), repeat {result['repeat_seconds']} s ({result['repeat_queries']} q)")
+    return results
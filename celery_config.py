@@ -13,6 +13,18 @@ beat_schedule = {
     'send-monthly-reports': {
         'task': 'monthly_reservation_report',
         'schedule': crontab(minute='*/2'),
+    },
+    'reconcile-dashboard-metrics': {
+        'task': 'reconcile_dashboard_metrics',
+        'schedule': crontab(minute=0),
+    },
+    'refresh-booking-rollups': {
+        'task': 'refresh_booking_rollups',
+        'schedule': crontab(minute='*/15'),
+    },
+    'archive-closed-bookings': {
+        'task': 'archive_bookings',
+        'schedule': crontab(hour=3, minute=30),
     }
 }
 
@@ -26,6 +38,6 @@ beat_schedule = {
 #  http://localhost:5000/api/mail
 
 #  redis ---> redis-server
-#  celery --> celery -A app.celery worker --loglevel INFO
-#  beat  ---> celery -A app.celery beat --loglevel INFO
+#  celery --> celery -A worker.celery worker --loglevel INFO
+#  beat  ---> celery -A worker.celery beat --loglevel INFO
 #  mailhog -> http://localhost:8025 -----> ./MailHog
\ No newline at end of file
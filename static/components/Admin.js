@@ -17,30 +17,58 @@ export default {
       isOccupied: false,
       selectedSpotModal: false,
       showUsers: false,
-      users: []
+      users: [],
+      eventSource: null,
+      exportJobs: {},
+      catalogVersion: null
     };
   },
 
   methods: {
-    async fetchLots() {
+    toLot(lot) {
+      return {
+        id: lot.id,
+        location_name: lot.place_label, 
+        pin_code: lot.zipcode, 
+        price: lot.hourly_rate, 
+        number_of_spots: lot.total_slots,
+        occupied_spots: lot.occupied_slots,
+        spots: Array.from(lot.states, (status, idx) => ({
+          number: idx + 1,
+          status: status,
+          lotId: lot.id
+        }))
+      };
+    },
+
+    applySpotStatus(facilityId, number, status) {
+      const lot = this.lots.find(l => l.id === facilityId);
+      const spot = lot && lot.spots.find(s => s.number === number);
+      if (spot && spot.status !== status) {
+        spot.status = status;
+        lot.occupied_spots += status === "O" ? 1 : -1;
+      }
+    },
+
+    async fetchLots(incremental = false) {
       try {
-        const res = await fetch("/api/lot", {
+        const since = incremental && this.catalogVersion !== null ? `&since=${this.catalogVersion}` : "";
+        const res = await fetch(`/api/lot?format=compact${since}`, {
           headers: { "Authentication-Token": localStorage.getItem("auth_token") }
         });
         const apiData = await res.json();
-        this.lots = apiData.map(lot => ({
-          id: lot.id,
-          location_name: lot.place_label, 
-          pin_code: lot.zipcode, 
-          price: lot.hourly_rate, 
-          number_of_spots: lot.total_slots,
-          occupied_spots: lot.occupied_slots,
-          spots: lot.slots.map(spot => ({
-            number: spot.number,
-            status: spot.status,
-            lotId: spot.facilityId
-          }))
-        }));
+        this.catalogVersion = apiData.version;
+        if (apiData.full) {
+          this.lots = apiData.facilities.map(this.toLot);
+          return;
+        }
+        apiData.slots.forEach(([facilityId, number, status]) => this.applySpotStatus(facilityId, number, status));
+        apiData.facilities.forEach(lot => {
+          const idx = this.lots.findIndex(l => l.id === lot.id);
+          if (idx === -1) this.lots.push(this.toLot(lot));
+          else this.lots.splice(idx, 1, this.toLot(lot));
+        });
+        this.lots = this.lots.filter(l => !apiData.deleted.includes(l.id));
       } catch (err) {
         console.error("Failed to fetch lots", err);
       }
@@ -175,6 +203,84 @@ export default {
         }
     },
 
+    async openEventStream() {
+      if (this.streamClosed) return;
+      let ticket;
+      try {
+        const res = await fetch("/events/ticket", {
+          method: "POST",
+          headers: { "Authentication-Token": localStorage.getItem("auth_token") }
+        });
+        ticket = (await res.json()).ticket;
+      } catch (err) {
+        console.error("Failed to get a stream ticket", err);
+      }
+      if (!ticket || this.streamClosed) {
+        if (!this.streamClosed) setTimeout(() => this.openEventStream(), 5000);
+        return;
+      }
+      this.eventSource = new EventSource(`/events/stream?ticket=${encodeURIComponent(ticket)}`);
+      this.eventSource.addEventListener("slot", (e) => {
+        const change = JSON.parse(e.data);
+        this.applySpotStatus(change.facility, change.number, change.status);
+      });
+      this.eventSource.addEventListener("facility", () => this.fetchLots(true));
+      this.eventSource.addEventListener("task", (e) => {
+        const task = JSON.parse(e.data);
+        if (!this.exportJobs[task.job_id]) return;
+        // Check as soon as it finishes instead of waiting for the next poll.
+        if (task.state !== "PROGRESS") this.downloadExport(task.job_id);
+      });
+      // Events missed while disconnected are not replayed; catch up from the last catalog version.
+      this.eventSource.onopen = () => this.fetchLots(true);
+      // Tickets are single-use, so reconnect with a fresh one rather than letting EventSource retry.
+      this.eventSource.onerror = () => {
+        this.eventSource.close();
+        setTimeout(() => this.openEventStream(), 3000);
+      };
+    },
+
+    downloadExport(taskId) {
+      // Polls until the job reaches a terminal state; task events only make it check sooner.
+      const job = this.exportJobs[taskId];
+      if (!job || job.fetching) return;
+      clearTimeout(job.timer);
+      job.fetching = true;
+      fetch(`/api/csv_result/${taskId}`, {
+        headers: { "Authentication-Token": localStorage.getItem("auth_token") }
+      })
+        .then(async res => {
+          job.fetching = false;
+          if (!this.exportJobs[taskId]) return;
+          if (res.status === 202) {
+            job.timer = setTimeout(() => this.downloadExport(taskId), 2000);
+            return;
+          }
+          delete this.exportJobs[taskId];
+          if (res.status === 200) {
+            return res.blob();
+          }
+          const err = await res.json();
+          alert("Error: " + (err.message || "Failed to generate CSV."));
+        })
+        .then(blob => {
+          if (!blob) return;
+          const url = window.URL.createObjectURL(blob);
+          const a = document.createElement('a');
+          a.href = url;
+          a.download = "reservations.csv";
+          document.body.appendChild(a);
+          a.click();
+          a.remove();
+          window.URL.revokeObjectURL(url);
+        })
+        .catch(err => {
+          delete this.exportJobs[taskId];
+          console.error("CSV Error:", err);
+          alert("Download failed. Please try again.");
+        });
+    },
+
     csvExport() {
       const token = localStorage.getItem("auth_token");
       fetch('/api/export', {
@@ -187,40 +293,8 @@ export default {
               alert("Error: Failed to start export task. Check Celery worker.");
               return;
           }
-          const interval = setInterval(() => {
-            fetch(`/api/csv_result/${taskId}`, {
-              headers: { "Authentication-Token": token }
-            })
-              .then(async res => {
-                if (res.status === 202) {
-                  console.log("⏳ Still generating...");
-                  return;
-                } else if (res.status === 200) {
-                  clearInterval(interval);
-                  return res.blob();
-                } else {
-                  const err = await res.json();
-                  clearInterval(interval);
-                  alert("Error: " + (err.message || "Failed to generate CSV."));
-                }
-              })
-              .then(blob => {
-                if (!blob) return;
-                const url = window.URL.createObjectURL(blob);
-                const a = document.createElement('a');
-                a.href = url;
-                a.download = "reservations.csv";
-                document.body.appendChild(a);
-                a.click();
-                a.remove();
-                window.URL.revokeObjectURL(url);
-              })
-              .catch(err => {
-                clearInterval(interval);
-                console.error("CSV Error:", err);
-                alert("Download failed. Please try again.");
-              });
-          }, 2000);
+          this.exportJobs[taskId] = { timer: null, fetching: false };
+          this.downloadExport(taskId);
         })
         .catch(err => {
           console.error("Export Task Failed:", err);
@@ -231,6 +305,14 @@ export default {
 
   mounted() {
     this.fetchLots();
+    this.openEventStream();
+  },
+
+  beforeDestroy() {
+    this.streamClosed = true;
+    if (this.eventSource) this.eventSource.close();
+    Object.values(this.exportJobs).forEach(job => clearTimeout(job.timer));
+    this.exportJobs = {};
   },
 
   template: `
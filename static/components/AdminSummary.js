@@ -37,6 +37,7 @@ export default {
             <div class="card-body">
               <h5 class="card-title">Total Revenue</h5>
               <p class="card-text fs-4">₹{{ summary.total_revenue }}</p>
+              <small>+ ₹{{ summary.projected_revenue }} from open bookings</small>
             </div>
           </div>
         </div>
@@ -53,6 +54,11 @@ export default {
         <canvas id="facilityRevenueChart" height="100"></canvas>
       </div>
 
+      <div class="container mt-4" style="max-width: 850px;">
+        <h5 class="text-center text-secondary mb-3">Daily Revenue (last 30 days)</h5>
+        <canvas id="revenueTrendChart" height="100"></canvas>
+      </div>
+
       <div class="text-center mt-4" v-if="!summary">
         <p class="text-muted">Fetching dashboard data...</p>
       </div>
@@ -63,7 +69,8 @@ export default {
     return {
       summary: null,
       facilityStats: [],
-      revenueData: []
+      revenueData: [],
+      revenueTrend: []
     };
   },
 
@@ -88,6 +95,17 @@ export default {
           location_name: item.location_name, 
           revenue: item.revenue               
       }));
+      const since = new Date(Date.now() - 30 * 24 * 3600 * 1000).toISOString().slice(0, 10);
+      const trendRes = await fetch(`/admin/rollups?granularity=day&start=${since}`, { headers });
+      const trendRows = trendRes.ok ? await trendRes.json() : [];
+      const byDay = {};
+      trendRows.forEach(row => {
+          byDay[row.bucket_start] = (byDay[row.bucket_start] || 0) + row.revenue;
+      });
+      this.revenueTrend = Object.keys(byDay).sort().map(bucket => ({
+          bucket_start: bucket,
+          revenue: Math.round(byDay[bucket] * 100) / 100
+      }));
       this.$nextTick(() => {
         if (this.facilityStats.length > 0) {
               this.renderUsageChart();
@@ -95,6 +113,9 @@ export default {
           if (this.revenueData.length > 0) {
               this.renderRevenueChart();
           }
+          if (this.revenueTrend.length > 0) {
+              this.renderTrendChart();
+          }
       });
     } catch (err) {
       console.error("Dashboard data load failed:", err);
@@ -139,6 +160,36 @@ export default {
       });
     },
 
+    renderTrendChart() {
+      const ctx = document.getElementById("revenueTrendChart").getContext("2d");
+      new Chart(ctx, {
+        type: "line",
+        data: {
+          labels: this.revenueTrend.map(t => t.bucket_start.slice(0, 10)),
+          datasets: [
+            {
+              label: "Revenue (₹)",
+              borderColor: "rgba(255, 159, 64, 1)",
+              backgroundColor: "rgba(255, 159, 64, 0.3)",
+              fill: true,
+              data: this.revenueTrend.map(t => t.revenue)
+            }
+          ]
+        },
+        options: {
+          responsive: true,
+          plugins: {
+            legend: {
+              position: "top"
+            }
+          },
+          scales: {
+            y: { beginAtZero: true }
+          }
+        }
+      });
+    },
+
     renderRevenueChart() {
       const labels = this.revenueData.map(r => r.location_name);
       const values = this.revenueData.map(r => r.revenue);
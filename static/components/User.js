@@ -107,6 +107,7 @@ export default {
       username: localStorage.getItem("username") || "User",
       facilities: [],
       bookings: [],
+      eventSource: null,
       showBookingModal: false,
       selectedFacilityId: null,
       vehicleNumber: "",
@@ -124,21 +125,59 @@ export default {
   methods: {
     async fetchFacilities() {
         try {
-            const res = await fetch("/catalog/facility", { 
+            const res = await fetch("/catalog/facility?format=compact", { 
                 headers: { "Authentication-Token": localStorage.getItem("auth_token") }
             });
             const apiData = await res.json();
-            this.facilities = apiData.map(fac => ({
+            this.facilities = apiData.facilities.map(fac => ({
                 id: fac.id,
                 place_label: fac.place_label, 
                 total_slots: fac.total_slots,
-                occupied: fac.occupied_slots
+                occupied: fac.occupied_slots,
+                states: Array.from(fac.states)
             }));
         } catch (err) {
             console.error("Failed to load facilities:", err);
         }
     },
 
+    async openEventStream() {
+        if (this.streamClosed) return;
+        let ticket;
+        try {
+            const res = await fetch("/events/ticket", {
+                method: "POST",
+                headers: { "Authentication-Token": localStorage.getItem("auth_token") }
+            });
+            ticket = (await res.json()).ticket;
+        } catch (err) {
+            console.error("Failed to get a stream ticket:", err);
+        }
+        if (!ticket || this.streamClosed) {
+            if (!this.streamClosed) setTimeout(() => this.openEventStream(), 5000);
+            return;
+        }
+        this.eventSource = new EventSource(`/events/stream?ticket=${encodeURIComponent(ticket)}`);
+        this.eventSource.addEventListener("slot", (e) => {
+            const change = JSON.parse(e.data);
+            const facility = this.facilities.find(f => f.id === change.facility);
+            const idx = change.number - 1;
+            // A change already seen (or already in the fetched states) is a no-op.
+            if (facility && idx < facility.states.length && facility.states[idx] !== change.status) {
+                facility.states.splice(idx, 1, change.status);
+                facility.occupied += change.status === "O" ? 1 : -1;
+            }
+        });
+        this.eventSource.addEventListener("facility", () => this.fetchFacilities());
+        // Events missed while disconnected are not replayed, so resync on (re)connect.
+        this.eventSource.onopen = () => this.fetchFacilities();
+        // Tickets are single-use, so reconnect with a fresh one rather than letting EventSource retry.
+        this.eventSource.onerror = () => {
+            this.eventSource.close();
+            setTimeout(() => this.openEventStream(), 3000);
+        };
+    },
+
     async fetchBookings() {
         try {
             const res = await fetch("/booking/history", { 
@@ -249,5 +288,11 @@ export default {
   mounted() {
     this.fetchFacilities();
     this.fetchBookings();
+    this.openEventStream();
+  },
+
+  beforeDestroy() {
+    this.streamClosed = true;
+    if (this.eventSource) this.eventSource.close();
   }
 };
@@ -0,0 +1,4 @@
+"""Celery entry point: celery -A worker.celery worker (or beat)"""
+from app import create_worker
+
+celery = create_worker()
@@ -0,0 +1,4 @@
+"""Web entry point, e.g. gunicorn wsgi:app"""
+from app import create_app
+
+app = create_app()